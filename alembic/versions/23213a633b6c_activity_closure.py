@@ -0,0 +1,52 @@
+"""activity closure
+
+Revision ID: 23213a633b6c
+Revises: 239ac5f1c7cb
+Create Date: 2026-10-17 12:40:18.662095
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '23213a633b6c'
+down_revision: Union[str, None] = '239ac5f1c7cb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activity_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index(op.f('ix_activity_closure_descendant_id'), 'activity_closure', ['descendant_id'], unique=False)
+    op.execute(
+        """
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE tree AS (
+                SELECT a.id AS ancestor_id, a.id AS descendant_id, 0 AS depth
+                FROM activity a
+                UNION ALL
+                SELECT t.ancestor_id, a.id, t.depth + 1
+                FROM tree t INNER JOIN activity a ON a.parent_id = t.descendant_id
+            )
+            SELECT t.ancestor_id, t.descendant_id, t.depth FROM tree t;
+        """
+    )
+    op.create_index(op.f('ix_activity_name'), 'activity', ['name'], unique=False)
+    op.create_index(op.f('ix_organization_activity_id'), 'organization', ['activity_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_organization_activity_id'), table_name='organization')
+    op.drop_index(op.f('ix_activity_name'), table_name='activity')
+    op.drop_index(op.f('ix_activity_closure_descendant_id'), table_name='activity_closure')
+    op.drop_table('activity_closure')
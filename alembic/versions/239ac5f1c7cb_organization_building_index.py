@@ -0,0 +1,26 @@
+"""organization building index
+
+Revision ID: 239ac5f1c7cb
+Revises: 743d930bbbf1
+Create Date: 2026-10-17 11:26:52.409317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '239ac5f1c7cb'
+down_revision: Union[str, None] = '743d930bbbf1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_organization_building_id'), 'organization', ['building_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_organization_building_id'), table_name='organization')
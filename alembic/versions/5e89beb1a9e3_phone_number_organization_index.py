@@ -0,0 +1,26 @@
+"""phone number organization index
+
+Revision ID: 5e89beb1a9e3
+Revises: 23213a633b6c
+Create Date: 2026-10-17 14:05:33.918274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e89beb1a9e3'
+down_revision: Union[str, None] = '23213a633b6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_phone_number_organization_id'), 'phone_number', ['organization_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_phone_number_organization_id'), table_name='phone_number')
@@ -0,0 +1,26 @@
+"""building coordinates index
+
+Revision ID: 743d930bbbf1
+Revises: d670c6eb3611
+Create Date: 2026-10-17 10:14:07.583120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '743d930bbbf1'
+down_revision: Union[str, None] = 'd670c6eb3611'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_building_latitude_longitude', 'building', ['latitude', 'longitude'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_building_latitude_longitude', table_name='building')
@@ -0,0 +1,33 @@
+"""api key hashed key unique
+
+Revision ID: b41f0d2c7e58
+Revises: 5e89beb1a9e3
+Create Date: 2026-10-17 20:55:12.402913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f0d2c7e58'
+down_revision: Union[str, None] = '5e89beb1a9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+            DELETE FROM api_key k
+            USING api_key d
+            WHERE k.hashed_key = d.hashed_key AND k.id > d.id;
+        """
+    )
+    op.create_index(op.f('ix_api_key_hashed_key'), 'api_key', ['hashed_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_api_key_hashed_key'), table_name='api_key')
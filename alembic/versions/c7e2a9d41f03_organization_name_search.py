@@ -0,0 +1,42 @@
+"""organization name search
+
+Revision ID: c7e2a9d41f03
+Revises: b41f0d2c7e58
+Create Date: 2026-10-17 21:10:47.118520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2a9d41f03'
+down_revision: Union[str, None] = 'b41f0d2c7e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_organization_name'), 'organization', ['name'], unique=False)
+    op.create_index('ix_organization_name_tsv', 'organization', [sa.text("to_tsvector('simple', name)")],
+                    unique=False, postgresql_using='gin')
+    op.create_index('ix_building_address_tsv', 'building', [sa.text("to_tsvector('simple', address)")],
+                    unique=False, postgresql_using='gin')
+    # fuzzy matching needs pg_trgm, which is not shipped with every PostgreSQL build
+    bind = op.get_bind()
+    if bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index('ix_organization_name_trgm', 'organization', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_building_address_trgm', 'building', ['address'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'address': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_building_address_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_organization_name_trgm")
+    op.drop_index('ix_building_address_tsv', table_name='building')
+    op.drop_index('ix_organization_name_tsv', table_name='organization')
+    op.drop_index(op.f('ix_organization_name'), table_name='organization')
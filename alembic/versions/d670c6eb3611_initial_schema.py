@@ -0,0 +1,84 @@
+"""initial schema
+
+Revision ID: d670c6eb3611
+Revises: 
+Create Date: 2026-10-17 10:02:41.215803
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd670c6eb3611'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Databases created by Base.metadata.create_all before migrations were introduced already have this schema
+    if sa.inspect(op.get_bind()).has_table('api_key'):
+        return
+    op.create_table('api_key',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('hashed_key', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_api_key_id'), 'api_key', ['id'], unique=False)
+    op.create_table('building',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('uuid', sa.UUID(), nullable=True),
+    sa.Column('address', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.CheckConstraint('latitude >= -90 AND latitude <= 90', name='check_latitude'),
+    sa.CheckConstraint('longitude >= -180 AND longitude <= 180', name='check_longitude'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_building_id'), 'building', ['id'], unique=False)
+    op.create_table('activity',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('uuid', sa.UUID(), nullable=True),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('parent_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_id'], ['activity.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_activity_id'), 'activity', ['id'], unique=False)
+    op.create_index(op.f('ix_activity_parent_id'), 'activity', ['parent_id'], unique=False)
+    op.create_table('organization',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('uuid', sa.UUID(), nullable=True),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('building_id', sa.Integer(), nullable=False),
+    sa.Column('activity_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['activity_id'], ['activity.id'], ),
+    sa.ForeignKeyConstraint(['building_id'], ['building.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_organization_id'), 'organization', ['id'], unique=False)
+    op.create_table('phone_number',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('number', sa.String(), nullable=False),
+    sa.Column('organization_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['organization_id'], ['organization.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_phone_number_id'), 'phone_number', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_phone_number_id'), table_name='phone_number')
+    op.drop_table('phone_number')
+    op.drop_index(op.f('ix_organization_id'), table_name='organization')
+    op.drop_table('organization')
+    op.drop_index(op.f('ix_activity_parent_id'), table_name='activity')
+    op.drop_index(op.f('ix_activity_id'), table_name='activity')
+    op.drop_table('activity')
+    op.drop_index(op.f('ix_building_id'), table_name='building')
+    op.drop_table('building')
+    op.drop_index(op.f('ix_api_key_id'), table_name='api_key')
+    op.drop_table('api_key')
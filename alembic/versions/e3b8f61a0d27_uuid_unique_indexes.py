@@ -0,0 +1,30 @@
+"""uuid unique indexes
+
+Revision ID: e3b8f61a0d27
+Revises: c7e2a9d41f03
+Create Date: 2026-10-17 21:32:05.560231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b8f61a0d27'
+down_revision: Union[str, None] = 'c7e2a9d41f03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_building_uuid'), 'building', ['uuid'], unique=True)
+    op.create_index(op.f('ix_activity_uuid'), 'activity', ['uuid'], unique=True)
+    op.create_index(op.f('ix_organization_uuid'), 'organization', ['uuid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_organization_uuid'), table_name='organization')
+    op.drop_index(op.f('ix_activity_uuid'), table_name='activity')
+    op.drop_index(op.f('ix_building_uuid'), table_name='building')
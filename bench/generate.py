@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import uuid
+import random
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CITIES = [
+    ("Moscow", 55.7558, 37.6173),
+    ("Saint Petersburg", 59.9343, 30.3351),
+    ("Novosibirsk", 55.0084, 82.9357),
+    ("Yekaterinburg", 56.8389, 60.6057),
+    ("Kazan", 55.7887, 49.1221),
+    ("Nizhny Novgorod", 56.2965, 43.9361),
+    ("Samara", 53.1959, 50.1002),
+    ("Krasnodar", 45.0355, 38.9753),
+]
+STREETS = ["Lenina", "Mira", "Sovetskaya", "Gagarina", "Pushkina", "Tverskaya", "Sadovaya", "Lesnaya",
+           "Shkolnaya", "Naberezhnaya", "Pobedy", "Molodezhnaya"]
+WORDS = ["Alpha", "Vector", "Nord", "Meridian", "Granit", "Sever", "Orion", "Delta", "Volga", "Ural", "Baikal",
+         "Kvant", "Zenit", "Polus", "Sibir", "Start", "Impuls", "Gorizont", "Rassvet", "Kristall"]
+FORMS = ["LLC", "JSC", "Group", "Trade", "Service", "Holding", "Studio", "Market"]
+ACTIVITIES = ["Food", "Retail", "Transport", "Health", "Education", "Construction", "Finance", "Media",
+              "Sports", "Tourism", "Energy", "Agriculture"]
+
+
+class Generator:
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(int=self.random.getrandbits(128), version=4))
+
+    def buildings(self, count: int, spread: float) -> list:
+        """
+        Buildings clustered around city centers: most of them near a center, fewer further out,
+        with city sizes skewed so that the first cities are much denser
+        """
+        weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+        buildings = []
+        for number in range(count):
+            city, latitude, longitude = self.random.choices(CITIES, weights=weights)[0]
+            buildings.append({
+                "uuid": self.uuid(),
+                "address": f"{city}, {self.random.choice(STREETS)} st., {number % 200 + 1}, bld. {number}",
+                "latitude": round(latitude + self.random.gauss(0, spread), 6),
+                "longitude": round(longitude + self.random.gauss(0, spread * 1.7), 6),
+            })
+        return buildings
+
+    def activities(self, count: int, depth: int) -> list:
+        """
+        Activity forest of given depth: a chain down to the deepest level under every root first,
+        then the remaining activities attached to random parents above the deepest level
+        """
+        roots = [{"uuid": self.uuid(), "name": name, "parent_uuid": None}
+                 for name in ACTIVITIES[:max(min(count, len(ACTIVITIES)), 1)]]
+        activities, levels = list(roots), {root["uuid"]: 1 for root in roots}
+        for root in roots:
+            parent = root
+            while levels[parent["uuid"]] < depth and len(activities) < count:
+                parent = self._child(parent, len(activities))
+                levels[parent["uuid"]] = levels[parent["parent_uuid"]] + 1
+                activities.append(parent)
+        parents = [activity for activity in activities if levels[activity["uuid"]] < depth]
+        while len(activities) < count:
+            activity = self._child(self.random.choice(parents), len(activities))
+            levels[activity["uuid"]] = levels[activity["parent_uuid"]] + 1
+            activities.append(activity)
+            if levels[activity["uuid"]] < depth:
+                parents.append(activity)
+        return activities
+
+    def _child(self, parent: dict, number: int) -> dict:
+        return {"uuid": self.uuid(), "name": f"{parent['name']} / {self.random.choice(WORDS)} {number}",
+                "parent_uuid": parent["uuid"]}
+
+    def organizations(self, count: int, buildings: list, activities: list, phones: int) -> list:
+        """
+        Organizations spread over buildings with a long tail, deeper activities chosen more often than roots
+        """
+        nested = [activity for activity in activities if activity["parent_uuid"] is not None] or activities
+        organizations = []
+        for number in range(count):
+            building = buildings[min(int(self.random.paretovariate(1.2)) - 1, len(buildings) - 1)] \
+                if self.random.random() < 0.2 else self.random.choice(buildings)
+            activity = self.random.choice(nested if self.random.random() < 0.8 else activities)
+            organizations.append({
+                "uuid": self.uuid(),
+                "name": f"{self.random.choice(WORDS)} {self.random.choice(WORDS)} {self.random.choice(FORMS)} "
+                        f"{number}",
+                "building_uuid": building["uuid"],
+                "activity_uuid": activity["uuid"],
+                "phone_numbers": [f"+7-9{self.random.randint(0, 99):02d}-{self.random.randint(0, 9999999):07d}"
+                                  for _ in range(self.random.randint(0, phones))],
+            })
+        return organizations
+
+
+def write(path: str, records: list):
+    with open(path, "w", encoding="utf-8") as stream:
+        for record in records:
+            stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+async def load(paths: dict, chunk_size: int):
+    """
+    Import generated files through the same Importer as ingest.py
+    """
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from config.main import Config
+    from src.pkg.database.engine import database
+    from src.pkg.database.models import async_session
+    from src.pkg.ingest.main import Importer
+    from src.pkg.logger.main import Logger
+
+    cfg = Config("config/config.yml").load()
+    database.configure(cfg["database"])
+    logger = Logger(filename='organization-bench.log', name='ORG-BENCH', cfg=cfg, console_output=True)
+    importer = Importer(async_session=async_session, logger=logger, chunk_size=chunk_size)
+    await importer.buildings(paths["buildings"])
+    await importer.activities(paths["activities"])
+    await importer.organizations(paths["organizations"])
+    await database.dispose()
+    logger.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic buildings, activities and organizations for benchmarks")
+    parser.add_argument("--buildings", type=int, default=10000)
+    parser.add_argument("--activities", type=int, default=500)
+    parser.add_argument("--organizations", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=6, help="levels of the activity tree")
+    parser.add_argument("--phones", type=int, default=3, help="max phone numbers per organization")
+    parser.add_argument("--spread", type=float, default=0.05, help="stddev of buildings around a city in degrees")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default=os.path.join(ROOT, "bench", "data"))
+    parser.add_argument("--load", action="store_true", help="import generated files into the configured database")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    generator = Generator(seed=args.seed)
+    buildings = generator.buildings(count=args.buildings, spread=args.spread)
+    activities = generator.activities(count=args.activities, depth=args.depth)
+    organizations = generator.organizations(count=args.organizations, buildings=buildings, activities=activities,
+                                            phones=args.phones)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    paths = {}
+    for kind, records in (("buildings", buildings), ("activities", activities), ("organizations", organizations)):
+        paths[kind] = os.path.join(args.output_dir, f"{kind}.ndjson")
+        write(paths[kind], records)
+        print(f"{kind}: {len(records)} records written to {paths[kind]}")
+
+    if args.load:
+        asyncio.run(load(paths=paths, chunk_size=args.chunk_size))
+
+
+if __name__ == '__main__':
+    main()
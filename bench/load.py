@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import datetime
+import statistics
+import subprocess
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "A5z~V2g+T8f*D0m^L!1"
+
+
+def read(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as stream:
+        return [json.loads(line) for line in stream if line.strip()]
+
+
+class Scenarios:
+    """
+    Requests for every router endpoint, parametrized by records sampled from the generated data
+    """
+    def __init__(self, data_dir: str, seed: int = 0, batch: int = 50, radius: float = 1000, limit: int = 50):
+        self.random = random.Random(seed)
+        self.buildings = read(os.path.join(data_dir, "buildings.ndjson"))
+        self.activities = read(os.path.join(data_dir, "activities.ndjson"))
+        self.organizations = read(os.path.join(data_dir, "organizations.ndjson"))
+        self.batch = batch
+        self.radius = radius
+        self.limit = limit
+        self.words = sorted({word for item in self.organizations for word in item["name"].split()[:2]})
+
+    def point(self) -> dict:
+        building = self.random.choice(self.buildings)
+        return {"latitude": building["latitude"], "longitude": building["longitude"], "radius": self.radius,
+                "limit": self.limit}
+
+    def all(self) -> dict:
+        """
+        Scenario name -> function returning (method, path, query params, json body) of the next request
+        """
+        choice, sample = self.random.choice, self.random.sample
+        return {
+            "activity.by_uuid": lambda: ("GET", "/activity/by_uuid", {"uuid": choice(self.activities)["uuid"]},
+                                         None),
+            "activity.all": lambda: ("GET", "/activity/all", {"limit": self.limit}, None),
+            "building.by_uuid": lambda: ("GET", "/building/by_uuid", {"uuid": choice(self.buildings)["uuid"]},
+                                         None),
+            "building.by_uuids": lambda: ("POST", "/building/by_uuids", None, {
+                "uuids": [item["uuid"] for item in sample(self.buildings, min(self.batch, len(self.buildings)))]}),
+            "building.in_radius": lambda: ("GET", "/building/in_radius", self.point(), None),
+            "organization.by_uuid": lambda: ("GET", "/organization/by_uuid",
+                                             {"uuid": choice(self.organizations)["uuid"]}, None),
+            "organization.by_uuids": lambda: ("POST", "/organization/by_uuids", None, {
+                "uuids": [item["uuid"] for item in sample(self.organizations,
+                                                          min(self.batch, len(self.organizations)))]}),
+            "organization.by_name": lambda: ("GET", "/organization/by_name",
+                                             {"name": choice(self.organizations)["name"]}, None),
+            "organization.in_radius": lambda: ("GET", "/organization/in_radius", self.point(), None),
+            "organization.by_activity": lambda: ("GET", "/organization/by_activity",
+                                                 {"activity": choice(self.activities)["name"], "limit": self.limit},
+                                                 None),
+            "organization.search": lambda: ("GET", "/organization/search",
+                                            {"query": choice(self.words), "limit": self.limit}, None),
+            "system.pool": lambda: ("GET", "/system/pool", None, None),
+        }
+
+
+def percentile(samples: list, rank: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[rank - 1]
+
+
+async def query_count(session: aiohttp.ClientSession, url: str) -> int:
+    """
+    Statements executed so far by the server, from /system/statements
+    Only meaningful against a single worker, as every worker keeps its own counters
+    """
+    async with session.get(f"{url}/system/statements") as response:
+        data = await response.json()
+    return sum(item["calls"] for item in data["content"]["statements"].values())
+
+
+async def run_scenario(session: aiohttp.ClientSession, url: str, request, requests: int, warm_up: int,
+                       concurrency: int, duration: float) -> dict:
+    """
+    Send warm_up requests, then requests (or as many as fit in duration seconds when it is set)
+    from concurrency workers, and summarize latencies, throughput and queries per request
+    """
+    latencies, statuses, errors = [], {}, [0]
+
+    async def send(record: bool):
+        method, path, params, body = request()
+        started_at = time.perf_counter()
+        try:
+            async with session.request(method, url + path, params=params, json=body) as response:
+                await response.read()
+                status = response.status
+        except aiohttp.ClientError:
+            errors[0] += 1
+            return
+        if record:
+            latencies.append(time.perf_counter() - started_at)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    for _ in range(warm_up):
+        await send(record=False)
+
+    queries_before = await query_count(session, url)
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def more() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        remaining[0] -= 1
+        return remaining[0] >= 0
+
+    async def worker():
+        while more():
+            await send(record=True)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started_at
+    queries = await query_count(session, url) - queries_before
+
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors[0],
+        "statuses": {str(status): total for status, total in sorted(statuses.items())},
+        "seconds": elapsed,
+        "rps": count / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) * 1000 if count else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if count else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if count else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if count else None,
+        "max_ms": max(latencies) * 1000 if count else None,
+        "queries_per_request": queries / count if count else None,
+    }
+
+
+def git_revision() -> dict:
+    def git(*args):
+        res = subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True)
+        return res.stdout.strip() if res.returncode == 0 else None
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "-uno"))}
+
+
+def print_report(scenarios: dict):
+    print(f"{'scenario':<26}{'requests':>9}{'errors':>7}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'queries':>9}")
+    for name, item in scenarios.items():
+        if not item["requests"]:
+            print(f"{name:<26}{0:>9}{item['errors']:>7}")
+            continue
+        print(f"{name:<26}{item['requests']:>9}{item['errors']:>7}{item['rps']:>9.0f}{item['p50_ms']:>9.2f}"
+              f"{item['p95_ms']:>9.2f}{item['p99_ms']:>9.2f}{item['queries_per_request']:>9.2f}")
+
+
+def compare(scenarios: dict, baseline: dict, threshold: float) -> list:
+    """
+    Print changes against a saved report and return scenarios whose p95 grew or throughput fell by more
+    than threshold percent
+    """
+    regressions = []
+    print(f"\ncompared to {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}):")
+    print(f"{'scenario':<26}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>10}")
+    for name, item in scenarios.items():
+        before = baseline["scenarios"].get(name)
+        if not before or not before["requests"] or not item["requests"]:
+            continue
+
+        def change(key):
+            return (item[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+
+        print(f"{name:<26}{change('rps'):>+9.1f}%{change('p50_ms'):>+9.1f}%{change('p95_ms'):>+9.1f}%"
+              f"{change('p99_ms'):>+9.1f}%{item['queries_per_request'] - before['queries_per_request']:>+10.2f}")
+        if change("p95_ms") > threshold or -change("rps") > threshold:
+            regressions.append(name)
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict:
+    scenarios = Scenarios(data_dir=args.data_dir, seed=args.seed, batch=args.batch, radius=args.radius,
+                          limit=args.limit).all()
+    names = args.scenario or list(scenarios)
+    unknown = set(names) - set(scenarios)
+    if unknown:
+        raise SystemExit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    results = {}
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     headers={"X-API-KEY": args.api_key}) as session:
+        for name in names:
+            results[name] = await run_scenario(session=session, url=args.url, request=scenarios[name],
+                                               requests=args.requests, warm_up=args.warm_up,
+                                               concurrency=args.concurrency, duration=args.duration)
+            print(f"{name}: {results[name]['requests']} requests, {results[name]['rps']:.0f} rps", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of every endpoint against a running app")
+    parser.add_argument("--url", default="http://127.0.0.1:8527")
+    parser.add_argument("--api-key", default=API_KEY, help="defaults to the key inserted by seed.py")
+    parser.add_argument("--data-dir", default=os.path.join(ROOT, "bench", "data"),
+                        help="files written by bench/generate.py, used to pick request parameters")
+    parser.add_argument("--scenario", action="append", help="run only given scenarios, may be repeated")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scenario")
+    parser.add_argument("--duration", type=float, help="run each scenario for this many seconds instead")
+    parser.add_argument("--warm-up", type=int, default=100, help="unmeasured requests per scenario")
+    parser.add_argument("--batch", type=int, default=50, help="uuids per by_uuids request")
+    parser.add_argument("--radius", type=float, default=1000, help="in_radius radius in meters")
+    parser.add_argument("--limit", type=int, default=50, help="page size of paginated endpoints")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--results-dir", default=os.path.join(ROOT, "bench", "results"))
+    parser.add_argument("--compare", help="saved report to compare with")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="percent of p95 growth or throughput loss reported as a regression")
+    args = parser.parse_args()
+
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    scenarios = asyncio.run(run(args))
+    report = {
+        "meta": {
+            **git_revision(),
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "url": args.url,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "data": {kind: sum(1 for _ in open(os.path.join(args.data_dir, f"{kind}.ndjson"), encoding="utf-8"))
+                     for kind in ("buildings", "activities", "organizations")},
+        },
+        "scenarios": scenarios,
+    }
+    print_report(scenarios)
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir,
+                        f"{started_at.strftime('%Y%m%dT%H%M%S')}-{report['meta']['commit'] or 'unknown'}.json")
+    with open(path, "w") as stream:
+        json.dump(report, stream, indent=2)
+    print(f"\nreport saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as stream:
+            regressions = compare(scenarios, json.load(stream), threshold=args.threshold)
+        if regressions:
+            print(f"regressions above {args.threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str, top: int) -> dict:
+    """
+    Import module in a fresh interpreter with -X importtime and return total and slowest modules by self time
+    """
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    modules = []
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000,
+                        "cumulative_ms": int(cumulative_us) / 1000})
+    total = next((item["cumulative_ms"] for item in modules if item["module"] == module), None)
+    return {
+        "module": module,
+        "total_ms": total,
+        "slowest": sorted(modules, key=lambda item: item["self_ms"], reverse=True)[:top],
+    }
+
+
+def time_to_first_request(url: str, timeout: float) -> float:
+    """
+    Start the app with main.py and return seconds until url answers with any HTTP status
+    """
+    started_at = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started_at < timeout:
+            try:
+                urllib.request.urlopen(url, timeout=1)
+                return time.perf_counter() - started_at
+            except urllib.error.HTTPError:
+                return time.perf_counter() - started_at
+            except (urllib.error.URLError, ConnectionError, TimeoutError):
+                time.sleep(0.01)
+        raise TimeoutError(f"{url} did not answer in {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile and time-to-first-request benchmark")
+    parser.add_argument("--module", default="src.main", help="module to profile imports of")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to report")
+    parser.add_argument("--url", default="http://127.0.0.1:8527/system/pool",
+                        help="endpoint polled until the started app answers")
+    parser.add_argument("--runs", type=int, default=5, help="number of app starts, 0 to only profile imports")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = {"imports": import_profile(module=args.module, top=args.top)}
+    print(f"import {args.module}: {report['imports']['total_ms']:.1f} ms")
+    for item in report["imports"]["slowest"]:
+        print(f"  {item['self_ms']:8.1f} ms self  {item['cumulative_ms']:8.1f} ms cumulative  {item['module']}")
+
+    if args.runs:
+        samples = [time_to_first_request(url=args.url, timeout=args.timeout) for _ in range(args.runs)]
+        report["startup"] = {"runs": samples, "min_s": min(samples), "median_s": statistics.median(samples),
+                             "max_s": max(samples)}
+        print(f"time to first request: min {min(samples):.3f} s, median {statistics.median(samples):.3f} s, "
+              f"max {max(samples):.3f} s over {len(samples)} runs")
+
+    if args.output:
+        with open(args.output, "w") as stream:
+            json.dump(report, stream, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import asyncio
+import argparse
+from logging import basicConfig, INFO
+from src.pkg.logger.main import Logger
+from config.main import Config
+from src.pkg.database.engine import database
+from src.pkg.database.models import async_session
+from src.pkg.ingest.main import Importer
+
+
+async def run_import(args: argparse.Namespace):
+    basicConfig(level=INFO)
+    cfg = Config("config/config.yml").load()
+    database.configure(cfg["database"])
+    logger = Logger(filename='organization-ingest.log', name='ORG-INGEST', cfg=cfg, console_output=True)
+    chunk_size = args.chunk_size or cfg.get("ingest", {}).get("chunk_size", 5000)
+    importer = Importer(async_session=async_session, logger=logger, chunk_size=chunk_size)
+    if args.buildings:
+        await importer.buildings(args.buildings)
+    if args.activities:
+        await importer.activities(args.activities)
+    if args.organizations:
+        await importer.organizations(args.organizations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk import of buildings, activities and organizations "
+                                                 "from CSV or NDJSON files")
+    parser.add_argument("--buildings", help="file with uuid, address, latitude, longitude")
+    parser.add_argument("--activities", help="file with uuid, name, parent_uuid or parent")
+    parser.add_argument("--organizations",
+                        help="file with uuid, name, building_uuid, activity_uuid or activity, phone_numbers")
+    parser.add_argument("--chunk-size", type=int, help="rows written per statement batch")
+    asyncio.run(run_import(parser.parse_args()))
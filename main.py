@@ -2,16 +2,24 @@ import asyncio
 from logging import basicConfig, INFO
 from src.pkg.logger.main import Logger
 from config.main import Config
-from src.main import App
+from src.main import App, run_workers
 
 
-async def run_app():
+async def run_app(cfg: dict):
     basicConfig(level=INFO)
-    cfg = Config("config/config.yml").load()
     logger = Logger(filename='organization-app.log', name='ORG-APP', cfg=cfg)
     app = App(cfg, logger)
     await app.run()
 
 
+def run():
+    cfg = Config("config/config.yml").load()
+    if cfg["app"].get("workers", 1) > 1:
+        basicConfig(level=INFO)
+        run_workers(cfg)
+    else:
+        asyncio.run(run_app(cfg))
+
+
 if __name__ == '__main__':
-    asyncio.run(run_app())
+    run()
@@ -0,0 +1,12 @@
+import asyncio
+from logging import basicConfig, INFO
+from src.pkg.database.models import insert_data
+
+
+async def run_seed():
+    basicConfig(level=INFO)
+    await insert_data()
+
+
+if __name__ == '__main__':
+    asyncio.run(run_seed())
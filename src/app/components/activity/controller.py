@@ -1,15 +1,23 @@
 from typing import Union
+from uuid import UUID
 from src.app.components.activity.repository import ActivityRepository
+from src.pkg.cache.main import ResponseCache, cached
+from src.pkg.cursor.main import Cursor
 from src.pkg.logger.main import Logger
+from src.pkg.ndjson.main import NDJSON
 
 
 class ActivityController:
-    def __init__(self, cfg: dict, logger: Logger, repository: ActivityRepository):
+    def __init__(self, cfg: dict, logger: Logger, repository: ActivityRepository,
+                 cache: Union[ResponseCache, None] = None):
         self.cfg = cfg
         self.logger = logger
         self.repository = repository
+        self.cache = cache
+        self.max_page_size = cfg["app"].get("max_page_size", 1000)
 
-    async def get_by_uuid(self, uuid: str):
+    @cached("activity")
+    async def get_by_uuid(self, uuid: UUID):
         activity = await self.repository.get_by_uuid(uuid=uuid)
         if not activity:
             return 404, {
@@ -22,15 +30,27 @@ class ActivityController:
             }
         }
 
-    async def get_all(self, limit: Union[int, None], offset: Union[int, None]):
-        if not limit:
-            limit = 1000000
+    @cached("activity")
+    async def get_all(self, limit: Union[int, None], offset: Union[int, None], cursor: Union[str, None] = None,
+                      stream: bool = False):
         if not offset:
             offset = 0
-        activities = await self.repository.get_all(limit=limit, offset=offset)
+        try:
+            after = Cursor.decode(cursor, types=(int,)) if cursor else None
+        except ValueError:
+            return 400, {
+                'message': "invalid cursor"
+            }
+        if stream:
+            return 200, NDJSON.encode(self.repository.stream_all(
+                limit=limit if limit and limit > 0 else None, offset=offset, after=after))
+        if not limit or not 0 < limit <= self.max_page_size:
+            limit = self.max_page_size
+        activities, next_cursor = await self.repository.get_all(limit=limit, offset=offset, after=after)
         return 200, {
             'message': "success",
             'content': {
-                "activities": activities
+                "activities": activities,
+                "next_cursor": next_cursor
             }
         }
@@ -1,16 +1,27 @@
 from typing import Union
-from sqlalchemy import text
+from uuid import UUID
+from src.app.components.activity.tree import ActivityTree
+from src.pkg.cursor.main import Cursor
+from src.pkg.singleflight.main import SingleFlight, coalesced
+from src.pkg.statements.main import statements
 
 
 class ActivityRepository:
-    def __init__(self, async_session):
+    def __init__(self, async_session, tree: Union[ActivityTree, None] = None,
+                 flight: Union[SingleFlight, None] = None):
         self.async_session = async_session
+        self.tree = tree
+        self.flight = flight
 
-    async def get_by_uuid(self, uuid: str):
+    @coalesced
+    async def get_by_uuid(self, uuid: UUID):
         """
         Select activity by uuid
         """
-        query = text(
+        if self.tree is not None:
+            return await self.tree.get_by_uuid(uuid=uuid)
+        query = statements.get(
+            "activity.by_uuid",
             """
                 SELECT a.uuid, a.name, p.uuid AS parent_uuid, p.name AS parent_name
                 FROM activity a LEFT JOIN activity p ON a.parent_id = p.id
@@ -18,26 +29,52 @@ class ActivityRepository:
             """
         )
         async with self.async_session() as session:
-            res = await session.execute(query, {"uuid": uuid})
+            res = await query.execute(session, {"uuid": uuid})
         row = res.fetchone()
         if not row:
             return
         return dict(row._mapping)
 
-    async def get_all(self, limit: int, offset: int):
-        """
-        Select all activities
-        """
-        query = text(
-            """
-                SELECT a.uuid, a.name, p.uuid AS parent_uuid, p.name AS parent_name
+    @staticmethod
+    def _all_query(limit: Union[int, None], offset: int, after: Union[list, None]):
+        query = statements.get(
+            "activity.all",
+            f"""
+                SELECT a.id AS cursor_id, a.uuid, a.name, p.uuid AS parent_uuid, p.name AS parent_name
                 FROM activity a LEFT JOIN activity p ON a.parent_id = p.id
+                {"WHERE a.id > :after_id" if after else ""}
+                ORDER BY a.id
                 LIMIT :limit OFFSET :offset;
             """
         )
+        params = {"limit": limit, "offset": offset}
+        if after:
+            params["after_id"] = after[0]
+        return query, params
+
+    @coalesced
+    async def get_all(self, limit: int, offset: int, after: Union[list, None] = None):
+        """
+        Select all activities ordered by id, starting after the id of given cursor values
+        Returns the page and the cursor of the next one
+        """
+        if self.tree is not None:
+            return await self.tree.get_all(limit=limit, offset=offset, after=after)
+        query, params = self._all_query(limit=limit + 1, offset=offset, after=after)
+        async with self.async_session() as session:
+            res = await query.execute(session, params)
+        return Cursor.page(rows=res.fetchall(), keys=("cursor_id",), limit=limit)
+
+    async def stream_all(self, limit: Union[int, None], offset: int, after: Union[list, None] = None):
+        """
+        Yield all activities ordered by id, fetched through a server-side cursor
+        """
+        if self.tree is not None:
+            async for row in self.tree.stream_all(limit=limit, offset=offset, after=after):
+                yield row
+            return
+        query, params = self._all_query(limit=limit, offset=offset, after=after)
         async with self.async_session() as session:
-            res = await session.execute(query, {"limit": limit, "offset": offset})
-        rows = res.fetchall()
-        if not rows:
-            return []
-        return [dict(row._mapping) for row in rows]
+            res = await query.stream(session, params)
+            async for row in res:
+                yield Cursor.strip(row=row, keys=("cursor_id",))
@@ -1,40 +1,40 @@
 from typing import Optional
-from fastapi import APIRouter, Request, Response
+from uuid import UUID
+from fastapi import APIRouter, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from src.app.components.activity.controller import ActivityController
-from src.app.components.middleware.main import Middleware
 from src.pkg.logger.main import Logger
+from src.pkg.metrics.main import metrics
+from src.pkg.ndjson.main import NDJSON
+from src.pkg.response.main import FastJSONResponse
 
 
 class ActivityRouter:
-    def __init__(self, controller: ActivityController, cfg, logger: Logger, middleware: Middleware):
+    def __init__(self, controller: ActivityController, cfg, logger: Logger):
         self.controller = controller
         self.cfg = cfg
         self.router = APIRouter()
         self.logger = logger
-        self.middleware = middleware
+        self.fast_json = cfg["app"].get("fast_json", False)
 
         @self.router.get('/by_uuid')
-        async def get_by_uuid(request: Request, response: Response, uuid: str):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
-
+        async def get_by_uuid(uuid: UUID):
             status_code, data = await self.controller.get_by_uuid(uuid=uuid)
-            response.status_code = status_code
-            return data
+            return self.respond(status_code=status_code, data=data)
 
         @self.router.get('/all')
-        async def get_all(request: Request, response: Response,
-                          limit: Optional[int] = None, offset: Optional[int] = None):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
+        async def get_all(limit: Optional[int] = Query(None, ge=1), offset: Optional[int] = Query(None, ge=0),
+                          cursor: Optional[str] = None, stream: bool = False):
+            status_code, data = await self.controller.get_all(limit=limit, offset=offset, cursor=cursor,
+                                                              stream=stream)
+            if stream and status_code == 200:
+                return StreamingResponse(data, media_type=NDJSON.media_type)
+            return self.respond(status_code=status_code, data=data)
 
-            status_code, data = await self.controller.get_all(limit=limit, offset=offset)
-            response.status_code = status_code
-            return data
+    def respond(self, status_code: int, data: dict):
+        with metrics.timed("encoding"):
+            if self.fast_json:
+                return FastJSONResponse(content=data, status_code=status_code)
+            return JSONResponse(content=jsonable_encoder(data), status_code=status_code)
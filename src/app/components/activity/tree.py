@@ -0,0 +1,155 @@
+import time
+import bisect
+import asyncio
+from array import array
+from typing import Union
+from uuid import UUID
+from src.pkg.cache.main import RedisBackend
+from src.pkg.cursor.main import Cursor
+from src.pkg.database.models import Activity
+from src.pkg.statements.main import statements
+
+
+class ActivityTree:
+    def __init__(self, async_session, refresh_interval: Union[float, None] = None,
+                 shared: Union[RedisBackend, None] = None, shared_check_interval: float = 1):
+        self.async_session = async_session
+        self.refresh_interval = refresh_interval
+        self.shared = shared
+        self.shared_check_interval = shared_check_interval
+        self.shared_version = None
+        self.checked_at = 0.0
+        self.version = 0
+        self.loaded_version = None
+        self.loaded_at = 0.0
+        self.lock = asyncio.Lock()
+        self._reset()
+        Activity.subscribe(self.invalidate)
+
+    def _reset(self):
+        self.ids = array("q")
+        self.parents = array("q")
+        self.uuids = []
+        self.names = []
+        self.positions = {}
+        self.by_uuid = {}
+        self.by_name = {}
+        self.children = {}
+
+    def invalidate(self, event: str = None, values: dict = None):
+        self.version += 1
+
+    @property
+    def stale(self) -> bool:
+        if self.loaded_version != self.version:
+            return True
+        return self.refresh_interval is not None and time.monotonic() - self.loaded_at > self.refresh_interval
+
+    async def check_shared(self):
+        """
+        Invalidate the tree when the activity tag version in the shared cache backend has changed,
+        which is how writes made by other worker processes reach this one
+        """
+        if self.shared is None or time.monotonic() - self.checked_at < self.shared_check_interval:
+            return
+        self.checked_at = time.monotonic()
+        [version] = await self.shared.get_versions(("activity",))
+        if version != self.shared_version:
+            self.shared_version = version
+            self.invalidate()
+
+    async def load(self):
+        """
+        Load all activities ordered by id into compact arrays
+        """
+        if self.shared is not None:
+            [self.shared_version] = await self.shared.get_versions(("activity",))
+            self.checked_at = time.monotonic()
+        version = self.version
+        query = statements.get(
+            "activity.tree",
+            """
+                SELECT a.id, a.uuid, a.name, a.parent_id
+                FROM activity a
+                ORDER BY a.id;
+            """
+        )
+        async with self.async_session() as session:
+            res = await query.execute(session)
+        rows = res.fetchall()
+
+        self._reset()
+        for position, row in enumerate(rows):
+            self.ids.append(row.id)
+            self.parents.append(row.parent_id if row.parent_id is not None else -1)
+            self.uuids.append(row.uuid)
+            self.names.append(row.name)
+            self.positions[row.id] = position
+            self.by_uuid[row.uuid] = position
+            self.by_name.setdefault(row.name, []).append(position)
+            if row.parent_id is not None:
+                self.children.setdefault(row.parent_id, []).append(row.id)
+        self.loaded_version = version
+        self.loaded_at = time.monotonic()
+
+    async def ensure(self):
+        """
+        Reload the tree if activities were written since last load or refresh interval has passed
+        """
+        await self.check_shared()
+        if not self.stale:
+            return
+        async with self.lock:
+            if self.stale:
+                await self.load()
+
+    def _row(self, position: int) -> dict:
+        parent = self.positions.get(self.parents[position])
+        return {
+            "uuid": self.uuids[position],
+            "name": self.names[position],
+            "parent_uuid": self.uuids[parent] if parent is not None else None,
+            "parent_name": self.names[parent] if parent is not None else None,
+        }
+
+    async def get_by_uuid(self, uuid: UUID) -> Union[dict, None]:
+        await self.ensure()
+        position = self.by_uuid.get(uuid)
+        if position is None:
+            return
+        return self._row(position)
+
+    def _range(self, limit: Union[int, None], offset: int, after: Union[list, None]) -> tuple[int, int]:
+        start = offset
+        if after:
+            start += bisect.bisect_right(self.ids, after[0])
+        if limit is None:
+            return start, len(self.ids)
+        return start, min(start + limit, len(self.ids))
+
+    async def get_all(self, limit: int, offset: int, after: Union[list, None] = None) -> tuple[list, Union[str, None]]:
+        await self.ensure()
+        start, end = self._range(limit=limit, offset=offset, after=after)
+        next_cursor = Cursor.encode([self.ids[end - 1]]) if end < len(self.ids) else None
+        return [self._row(position) for position in range(start, end)], next_cursor
+
+    async def stream_all(self, limit: Union[int, None], offset: int, after: Union[list, None] = None):
+        await self.ensure()
+        start, end = self._range(limit=limit, offset=offset, after=after)
+        rows = [self._row(position) for position in range(start, end)]
+        for row in rows:
+            yield row
+
+    async def get_descendant_ids(self, name: str) -> list:
+        """
+        Ids of activities with given name and all their descendants at any depth
+        """
+        await self.ensure()
+        ids = [self.ids[position] for position in self.by_name.get(name, [])]
+        seen = set(ids)
+        for id in ids:
+            for child in self.children.get(id, []):
+                if child not in seen:
+                    seen.add(child)
+                    ids.append(child)
+        return ids
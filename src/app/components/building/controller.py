@@ -1,15 +1,24 @@
 from typing import Union
+from uuid import UUID
 from src.app.components.building.repository import BuildingRepository
+from src.pkg.cache.main import ResponseCache, cached
+from src.pkg.cursor.main import Cursor
 from src.pkg.logger.main import Logger
+from src.pkg.ndjson.main import NDJSON
 
 
 class BuildingController:
-    def __init__(self, cfg: dict, logger: Logger, repository: BuildingRepository):
+    def __init__(self, cfg: dict, logger: Logger, repository: BuildingRepository,
+                 cache: Union[ResponseCache, None] = None):
         self.cfg = cfg
         self.logger = logger
         self.repository = repository
+        self.cache = cache
+        self.max_page_size = cfg["app"].get("max_page_size", 1000)
+        self.max_batch_size = cfg["app"].get("max_batch_size", 5000)
 
-    async def get_by_uuid(self, uuid: str):
+    @cached("building")
+    async def get_by_uuid(self, uuid: UUID):
         building = await self.repository.get_by_uuid(uuid=uuid)
         if not building:
             return 404, {
@@ -22,17 +31,46 @@ class BuildingController:
             }
         }
 
+    async def get_by_uuids(self, uuids: list[UUID]):
+        if len(uuids) > self.max_batch_size:
+            return 400, {
+                'message': f"too many uuids, at most {self.max_batch_size} are allowed"
+            }
+        uuids = list(dict.fromkeys(uuids))
+        buildings = await self.repository.get_by_uuids(uuids=uuids) if uuids else {}
+        return 200, {
+            'message': "success",
+            'content': {
+                "buildings": buildings,
+                "not_found": [str(uuid) for uuid in uuids if str(uuid) not in buildings]
+            }
+        }
+
+    @cached("building")
     async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: Union[int, None],
-                            offset: Union[int, None]):
-        if not limit:
-            limit = 1000000
+                            offset: Union[int, None], order_by_distance: bool = False,
+                            cursor: Union[str, None] = None, stream: bool = False):
         if not offset:
             offset = 0
-        buildings = await self.repository.get_in_radius(latitude=latitude, longitude=longitude, radius=radius,
-                                                        limit=limit, offset=offset)
+        try:
+            after = Cursor.decode(cursor, types=(float, int) if order_by_distance else (int,)) if cursor else None
+        except ValueError:
+            return 400, {
+                'message': "invalid cursor"
+            }
+        if stream:
+            return 200, NDJSON.encode(self.repository.stream_in_radius(
+                latitude=latitude, longitude=longitude, radius=radius, limit=limit if limit and limit > 0 else None,
+                offset=offset, order_by_distance=order_by_distance, after=after))
+        if not limit or not 0 < limit <= self.max_page_size:
+            limit = self.max_page_size
+        buildings, next_cursor = await self.repository.get_in_radius(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset,
+            order_by_distance=order_by_distance, after=after)
         return 200, {
             'message': "success",
             'content': {
-                "buildings": buildings
+                "buildings": buildings,
+                "next_cursor": next_cursor
             }
         }
@@ -1,16 +1,140 @@
+import asyncio
 from typing import Union
-from sqlalchemy import text
+from uuid import UUID
+from sqlalchemy.exc import SQLAlchemyError
+from src.pkg.cursor.main import Cursor
+from src.pkg.database.models import Building
+from src.pkg.geo.main import Geo, SpatialIndex
+from src.pkg.serialization.main import JSON
+from src.pkg.singleflight.main import SingleFlight, coalesced
+from src.pkg.statements.main import statements
 
 
 class BuildingRepository:
-    def __init__(self, async_session):
+    def __init__(self, async_session, index: Union[SpatialIndex, None] = None, pre_encode: bool = False,
+                 flight: Union[SingleFlight, None] = None):
         self.async_session = async_session
+        self.index = index
+        self.pre_encode = pre_encode
+        self.flight = flight
+        self.loading = None
+        self.loaded_id = 0
+        self.changes = None
+        self.version = 0
+        if self.index is not None:
+            Building.subscribe(self.on_change)
 
-    async def get_by_uuid(self, uuid: str):
+    async def _points(self, rows: list, chunk_size: int = 10000) -> list:
+        """
+        Index points for fetched rows, built in chunks that yield to the event loop in between
+        """
+        points = []
+        for start in range(0, len(rows), chunk_size):
+            points.extend(
+                (row.id, row.latitude, row.longitude,
+                 self._payload({"uuid": row.uuid, "address": row.address, "latitude": row.latitude,
+                                "longitude": row.longitude}))
+                for row in rows[start:start + chunk_size]
+            )
+            await asyncio.sleep(0)
+        return points
+
+    async def load_index(self):
+        """
+        Load coordinates of all buildings into the in-memory spatial index
+        Saves and deletes notified while the rows are fetched are replayed onto the loaded index, and the load
+        is repeated when a bulk write happened meanwhile, so that no change is lost
+        """
+        query = statements.get(
+            "building.index",
+            """
+                SELECT b.id, b.uuid, b.address, b.latitude, b.longitude
+                FROM building b
+                ORDER BY b.id;
+            """
+        )
+        version = self.version
+        self.changes = []
+        try:
+            async with self.async_session() as session:
+                res = await query.execute(session)
+            rows = res.fetchall()
+            points = await self._points(rows)
+            self.index.load(points)
+            self.loaded_id = rows[-1].id if rows else 0
+            for event, values in self.changes:
+                self._apply(event, values)
+        finally:
+            self.changes = None
+        if self.version != version:
+            self.index.ready = False
+            self.loading = asyncio.get_running_loop().create_task(self.load_index())
+
+    async def refresh_index(self, interval: float):
+        """
+        Every interval seconds add buildings inserted by other processes, such as ingest.py, seed.py or other
+        workers, fetching only ids above the last loaded one; the index keeps serving if the database is unavailable
+        """
+        query = statements.get(
+            "building.index_after",
+            """
+                SELECT b.id, b.uuid, b.address, b.latitude, b.longitude
+                FROM building b
+                WHERE b.id > :after_id
+                ORDER BY b.id;
+            """
+        )
+        while True:
+            await asyncio.sleep(interval)
+            if self.changes is not None:
+                continue
+            try:
+                async with self.async_session() as session:
+                    res = await query.execute(session, {"after_id": self.loaded_id})
+                rows = res.fetchall()
+            except (SQLAlchemyError, OSError):
+                continue
+            if rows:
+                self.index.extend(await self._points(rows))
+                self.loaded_id = rows[-1].id
+
+    def _payload(self, row: dict):
+        """
+        Row kept in the spatial index, pre-encoded to a JSON fragment when the fast serialization path is on
+        """
+        if self.pre_encode:
+            return JSON.fragment(row)
+        return row
+
+    def on_change(self, event: str, values: dict):
+        """
+        Keep the spatial index fresh: apply saves and deletes by id in place, reload it in background otherwise
+        """
+        if event == "save" or (event == "delete" and list(values) == ["id"]):
+            if self.changes is not None:
+                self.changes.append((event, values))
+            self._apply(event, values)
+            return
+        self.version += 1
+        self.index.ready = False
+        if self.loading is None or self.loading.done():
+            self.loading = asyncio.get_running_loop().create_task(self.load_index())
+
+    def _apply(self, event: str, values: dict):
+        if event == "save":
+            self.index.add(values["id"], values["latitude"], values["longitude"],
+                           self._payload({"uuid": values["uuid"], "address": values["address"],
+                                          "latitude": values["latitude"], "longitude": values["longitude"]}))
+            return
+        self.index.remove(values["id"])
+
+    @coalesced
+    async def get_by_uuid(self, uuid: UUID):
         """
         Select building by uuid
         """
-        query = text(
+        query = statements.get(
+            "building.by_uuid",
             """
                 SELECT b.uuid, b.address, b.latitude, b.longitude
                 FROM building b
@@ -18,36 +142,124 @@ class BuildingRepository:
             """
         )
         async with self.async_session() as session:
-            res = await session.execute(query, {"uuid": uuid})
+            res = await query.execute(session, {"uuid": uuid})
         row = res.fetchone()
         if not row:
             return
         return dict(row._mapping)
 
-    async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: int, offset: int):
+    @coalesced
+    async def get_by_uuids(self, uuids: list[UUID]) -> dict:
         """
-        Select all buildings in given radius in meters from point with given latitude and longitude
-        Uses Haversine formula
+        Select buildings by list of uuids in one query, keyed by uuid
         """
-        query = text(
+        query = statements.get(
+            "building.by_uuids",
             """
                 SELECT b.uuid, b.address, b.latitude, b.longitude
                 FROM building b
-                WHERE (
-                    6378000 * acos(
-                        cos(radians(:latitude)) * cos(radians(b.latitude)) *
-                        cos(radians(b.longitude) - radians(:longitude)) +
-                        sin(radians(:latitude)) * sin(radians(b.latitude))
-                    )
-                ) <= :radius
+                WHERE b.uuid = ANY(:uuids);
+            """
+        )
+        async with self.async_session() as session:
+            res = await query.execute(session, {"uuids": uuids})
+        return {str(row.uuid): dict(row._mapping) for row in res.fetchall()}
+
+    def _index_query(self, latitude: float, longitude: float, radius: float, order_by_distance: bool,
+                     after: Union[list, None]):
+        ids, distances = self.index.query(latitude=latitude, longitude=longitude, radius=radius,
+                                          order_by_distance=order_by_distance)
+        if after and order_by_distance:
+            keep = (distances > after[0]) | ((distances == after[0]) & (ids > after[1]))
+            ids, distances = ids[keep], distances[keep]
+        elif after:
+            keep = ids > after[0]
+            ids, distances = ids[keep], distances[keep]
+        return ids, distances
+
+    @staticmethod
+    def _in_radius_query(latitude: float, longitude: float, radius: float, limit: Union[int, None], offset: int,
+                         order_by_distance: bool, after: Union[list, None]):
+        distance = Geo.distance_sql("b")
+        if order_by_distance:
+            keys, after_keys = ("cursor_distance", "cursor_id"), ("after_distance", "after_id")
+            columns = f"{distance} AS cursor_distance, b.id AS cursor_id"
+            keyset = f"AND ({distance}, b.id) > (:after_distance, :after_id)"
+            order = f"{distance}, b.id"
+        else:
+            keys, after_keys = ("cursor_id",), ("after_id",)
+            columns = "b.id AS cursor_id"
+            keyset = "AND b.id > :after_id"
+            order = "b.id"
+        query = statements.get(
+            "building.in_radius",
+            f"""
+                SELECT {columns}, b.uuid, b.address, b.latitude, b.longitude
+                FROM building b
+                WHERE {Geo.bounding_box_sql("b")}
+                AND {distance} <= :radius
+                {keyset if after else ""}
+                ORDER BY {order}
                 LIMIT :limit OFFSET :offset;
             """
         )
+        params = {"latitude": latitude, "longitude": longitude, "radius": radius, "limit": limit,
+                  "offset": offset, **Geo.bounding_box(latitude=latitude, longitude=longitude, radius=radius)}
+        if after:
+            params.update(zip(after_keys, after))
+        return query, params, keys
+
+    @coalesced
+    async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: int, offset: int,
+                            order_by_distance: bool = False, after: Union[list, None] = None):
+        """
+        Select all buildings in given radius in meters from point with given latitude and longitude
+        ordered by id, or by distance and id, starting after given cursor values
+        Served from the in-memory spatial index when it is loaded, otherwise prefilters by an indexed
+        bounding box and then applies the exact great-circle distance
+        Returns the page and the cursor of the next one
+        """
+        if self.index is not None and self.index.ready:
+            ids, distances = self._index_query(latitude=latitude, longitude=longitude, radius=radius,
+                                               order_by_distance=order_by_distance, after=after)
+            ids, distances = ids[offset:offset + limit + 1].tolist(), distances[offset:offset + limit + 1].tolist()
+            next_cursor = None
+            if len(ids) > limit:
+                keys = [distances[limit - 1], ids[limit - 1]] if order_by_distance else [ids[limit - 1]]
+                next_cursor = Cursor.encode(keys)
+            rows = [self.index.rows[id] for id in ids[:limit]]
+            if not rows:
+                return None, None
+            return rows, next_cursor
+
+        query, params, keys = self._in_radius_query(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit + 1, offset=offset,
+            order_by_distance=order_by_distance, after=after)
         async with self.async_session() as session:
-            res = await session.execute(
-                query, {"latitude": latitude, "longitude": longitude, "radius": radius, "limit": limit,
-                        "offset": offset})
-        rows = res.fetchall()
+            res = await query.execute(session, params)
+        rows, next_cursor = Cursor.page(rows=res.fetchall(), keys=keys, limit=limit)
         if not rows:
+            return None, None
+        return rows, next_cursor
+
+    async def stream_in_radius(self, latitude: float, longitude: float, radius: float, limit: Union[int, None],
+                               offset: int, order_by_distance: bool = False, after: Union[list, None] = None):
+        """
+        Yield all buildings in given radius in the order of get_in_radius, fetched through a server-side cursor
+        """
+        if self.index is not None and self.index.ready:
+            ids, _ = self._index_query(latitude=latitude, longitude=longitude, radius=radius,
+                                       order_by_distance=order_by_distance, after=after)
+            rows = self.index.rows
+            for id in ids[offset:None if limit is None else offset + limit].tolist():
+                if id in rows:
+                    yield rows[id]
             return
-        return [dict(row._mapping) for row in rows]
+
+        query, params, keys = self._in_radius_query(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset,
+            order_by_distance=order_by_distance, after=after)
+        async with self.async_session() as session:
+            res = await query.stream(session, params)
+            async for row in res:
+                yield Cursor.strip(row=row, keys=keys)
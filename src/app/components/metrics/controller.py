@@ -0,0 +1,58 @@
+from typing import Union
+from src.pkg.cache.main import ResponseCache
+from src.pkg.database.pool import PoolMetrics
+from src.pkg.database.replicas import ReplicaSet
+from src.pkg.logger.main import Logger
+from src.pkg.metrics.main import Metrics
+from src.pkg.statements.main import Statements
+
+
+class MetricsController:
+    def __init__(self, cfg: dict, logger: Logger, metrics: Metrics, pool_metrics: PoolMetrics, replicas: ReplicaSet,
+                 statements: Statements, cache: Union[ResponseCache, None] = None):
+        self.cfg = cfg
+        self.logger = logger
+        self.metrics = metrics
+        self.pool_metrics = pool_metrics
+        self.replicas = replicas
+        self.statements = statements
+        self.cache = cache
+
+    def families(self) -> list:
+        """
+        Current pool, statement, replica and cache counters as (name, type, help, samples) families
+        """
+        pool = self.pool_metrics.snapshot()
+        statements = self.statements.stats()
+        families = [
+            ("app_db_pool_size", "gauge", "Connections kept in the primary pool",
+             [({}, pool["size"])]),
+            ("app_db_pool_checked_out", "gauge", "Connections currently checked out of the primary pool",
+             [({}, pool["checked_out"])]),
+            ("app_db_pool_overflow", "gauge", "Overflow connections currently open",
+             [({}, pool["overflow"])]),
+            ("app_db_pool_checkouts_total", "counter", "Connection checkouts",
+             [({}, pool["checkouts"])]),
+            ("app_db_pool_timeouts_total", "counter", "Checkouts that timed out waiting for a connection",
+             [({}, pool["timeouts"])]),
+            ("app_db_pool_wait_seconds_total", "counter", "Time spent waiting for connections",
+             [({}, pool["wait_seconds_total"])]),
+            ("app_statement_calls_total", "counter", "Statement executions by name",
+             [({"statement": name}, item["calls"]) for name, item in statements.items()]),
+            ("app_statement_seconds_total", "counter", "Statement execution time by name",
+             [({"statement": name}, item["seconds_total"]) for name, item in statements.items()]),
+            ("app_db_replica_healthy", "gauge", "Replica health as of the last check",
+             [({"replica": name}, int(healthy)) for name, healthy in self.replicas.status().items()]),
+        ]
+        if self.cache is not None:
+            stats = self.cache.stats()
+            families += [
+                ("app_cache_hits_total", "counter", "Response cache hits by controller method",
+                 [({"name": name}, item["hits"]) for name, item in stats.items()]),
+                ("app_cache_misses_total", "counter", "Response cache misses by controller method",
+                 [({"name": name}, item["misses"]) for name, item in stats.items()]),
+            ]
+        return families
+
+    async def get_metrics(self):
+        return 200, self.metrics.render(families=self.families())
@@ -0,0 +1,22 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.app.components.metrics.controller import MetricsController
+from src.pkg.logger.main import Logger
+
+
+class MetricsRouter:
+    def __init__(self, controller: MetricsController, cfg, logger: Logger):
+        self.controller = controller
+        self.cfg = cfg
+        self.router = APIRouter()
+        self.logger = logger
+
+        @self.router.get('/metrics', response_class=PlainTextResponse)
+        async def get_metrics():
+            """
+            Prometheus text exposition, unauthenticated so that scrapers need no api key
+            """
+            status_code, data = await self.controller.get_metrics()
+            return PlainTextResponse(content=data, status_code=status_code,
+                                     media_type="text/plain; version=0.0.4; charset=utf-8")
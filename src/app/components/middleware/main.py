@@ -1,14 +1,94 @@
+import os
+import hmac
+import asyncio
+import hashlib
+from sqlalchemy.exc import SQLAlchemyError
 from src.pkg.database.models import ApiKey
 from src.pkg.hasher.main import Hasher
+from src.pkg.logger.main import Logger
+from src.pkg.metrics.main import metrics
+
+EXEMPT = ("/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json")
+REJECTED = b'{"message":"authentication failed"}'
 
 
 class Middleware:
-    def __init__(self, hasher: Hasher):
+    def __init__(self, hasher: Hasher, cfg: dict, logger: Logger):
         self.hasher = hasher
+        self.logger = logger
+        auth_cfg = cfg.get("auth", {})
+        self.refresh_interval = auth_cfg.get("refresh_interval", 30)
+        self.exempt = frozenset(auth_cfg.get("exempt", EXEMPT))
+        self.secret = os.urandom(32)
+        self.keys = frozenset()
+        self.loading = None
+        ApiKey.subscribe(self.invalidate)
+
+    def digest(self, hashed_key: str) -> bytes:
+        """
+        Stored hash keyed with a per-process secret, so that lookup timing tells nothing about stored hashes
+        """
+        return hmac.digest(self.secret, hashed_key.encode("utf-8"), hashlib.sha256)
+
+    def invalidate(self, event: str, values: dict):
+        """
+        Apply writes to api_key: saved keys are added and deleted ones removed in place, reload otherwise
+        """
+        if event == "save":
+            self.keys = self.keys | {self.digest(values["hashed_key"])}
+            return
+        if event == "delete" and list(values) == ["hashed_key"]:
+            self.keys = self.keys - {self.digest(values["hashed_key"])}
+            return
+        if self.loading is None or self.loading.done():
+            self.loading = asyncio.get_running_loop().create_task(self.preload())
+
+    async def preload(self):
+        """
+        Load digests of all existing api keys, replacing the current set at once
+        """
+        self.keys = frozenset(self.digest(api_key.hashed_key) for api_key in await ApiKey.get_all())
+
+    async def refresh(self):
+        """
+        Reload api keys every refresh_interval seconds, keeping the current ones if the database is unavailable
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.preload()
+            except (SQLAlchemyError, OSError) as e:
+                self.logger.error("api keys refresh failed: %s", e)
+
+    def authenticate(self, key: bytes) -> bool:
+        """
+        Check a raw X-API-KEY value against the in-memory set, without touching the database
+        """
+        with metrics.timed("auth"):
+            if not key:
+                return False
+            return self.digest(self.hasher.get_hash(data=key.decode("latin-1"))) in self.keys
+
+
+class AuthMiddleware:
+    def __init__(self, app, middleware: Middleware):
+        self.app = app
+        self.middleware = middleware
 
-    async def authenticate(self, headers) -> bool:
-        if not "X-API-KEY" in headers:
-            return False
-        if not await ApiKey.get(hashed_key=self.hasher.get_hash(data=str(headers["X-API-KEY"]))):
-            return False
-        return True
+    async def __call__(self, scope, receive, send):
+        """
+        Reject HTTP requests without a valid X-API-KEY before routing and request parsing
+        """
+        if scope["type"] != "http" or scope["path"] in self.middleware.exempt:
+            await self.app(scope, receive, send)
+            return
+        key = next((value for name, value in scope["headers"] if name == b"x-api-key"), None)
+        if self.middleware.authenticate(key):
+            await self.app(scope, receive, send)
+            return
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(REJECTED)).encode())],
+        })
+        await send({"type": "http.response.body", "body": REJECTED})
@@ -1,15 +1,24 @@
 from typing import Union
+from uuid import UUID
 from src.app.components.organization.repository import OrganizationRepository
+from src.pkg.cache.main import ResponseCache, cached
+from src.pkg.cursor.main import Cursor
 from src.pkg.logger.main import Logger
+from src.pkg.ndjson.main import NDJSON
 
 
 class OrganizationController:
-    def __init__(self, cfg: dict, logger: Logger, repository: OrganizationRepository):
+    def __init__(self, cfg: dict, logger: Logger, repository: OrganizationRepository,
+                 cache: Union[ResponseCache, None] = None):
         self.cfg = cfg
         self.logger = logger
         self.repository = repository
+        self.cache = cache
+        self.max_page_size = cfg["app"].get("max_page_size", 1000)
+        self.max_batch_size = cfg["app"].get("max_batch_size", 5000)
 
-    async def get_by_uuid(self, uuid: str):
+    @cached("organization", "building", "activity", "phone_number")
+    async def get_by_uuid(self, uuid: UUID):
         organization = await self.repository.get_by_uuid(uuid=uuid)
         if not organization:
             return 404, {
@@ -22,6 +31,22 @@ class OrganizationController:
             }
         }
 
+    async def get_by_uuids(self, uuids: list[UUID]):
+        if len(uuids) > self.max_batch_size:
+            return 400, {
+                'message': f"too many uuids, at most {self.max_batch_size} are allowed"
+            }
+        uuids = list(dict.fromkeys(uuids))
+        organizations = await self.repository.get_by_uuids(uuids=uuids) if uuids else {}
+        return 200, {
+            'message': "success",
+            'content': {
+                "organizations": organizations,
+                "not_found": [str(uuid) for uuid in uuids if str(uuid) not in organizations]
+            }
+        }
+
+    @cached("organization", "building", "activity", "phone_number")
     async def get_by_name(self, name: str):
         organization = await self.repository.get_by_name(name=name)
         if not organization:
@@ -35,30 +60,87 @@ class OrganizationController:
             }
         }
 
+    @cached("organization", "building", "activity", "phone_number")
     async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: Union[int, None],
-                            offset: Union[int, None]):
-        if not limit:
-            limit = 1000000
+                            offset: Union[int, None], order_by_distance: bool = False,
+                            cursor: Union[str, None] = None, stream: bool = False):
         if not offset:
             offset = 0
-        organizations = await self.repository.get_in_radius(latitude=latitude, longitude=longitude, radius=radius,
-                                                            limit=limit, offset=offset)
+        try:
+            after = Cursor.decode(cursor, types=(float, int) if order_by_distance else (int,)) if cursor else None
+        except ValueError:
+            return 400, {
+                'message': "invalid cursor"
+            }
+        if stream:
+            return 200, NDJSON.encode(self.repository.stream_in_radius(
+                latitude=latitude, longitude=longitude, radius=radius, limit=limit if limit and limit > 0 else None,
+                offset=offset, order_by_distance=order_by_distance, after=after))
+        if not limit or not 0 < limit <= self.max_page_size:
+            limit = self.max_page_size
+        organizations, next_cursor = await self.repository.get_in_radius(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset,
+            order_by_distance=order_by_distance, after=after)
         return 200, {
             'message': "success",
             'content': {
-                "organizations": organizations
+                "organizations": organizations,
+                "next_cursor": next_cursor
             }
         }
 
-    async def get_by_activity(self, activity_uuid: str, limit: Union[int, None], offset: Union[int, None]):
-        if not limit:
-            limit = 1000000
+    @cached("organization", "building", "activity", "phone_number")
+    async def get_by_activity(self, activity: str, limit: Union[int, None], offset: Union[int, None],
+                              cursor: Union[str, None] = None, stream: bool = False):
         if not offset:
             offset = 0
-        organizations = await self.repository.get_by_activity(activity_uuid=activity_uuid, limit=limit, offset=offset)
+        try:
+            after = Cursor.decode(cursor, types=(int,)) if cursor else None
+        except ValueError:
+            return 400, {
+                'message': "invalid cursor"
+            }
+        if stream:
+            return 200, NDJSON.encode(self.repository.stream_by_activity(
+                activity=activity, limit=limit if limit and limit > 0 else None, offset=offset, after=after))
+        if not limit or not 0 < limit <= self.max_page_size:
+            limit = self.max_page_size
+        organizations, next_cursor = await self.repository.get_by_activity(activity=activity, limit=limit,
+                                                                           offset=offset, after=after)
+        return 200, {
+            'message': "success",
+            'content': {
+                "organizations": organizations,
+                "next_cursor": next_cursor
+            }
+        }
+
+    @cached("organization", "building", "activity", "phone_number")
+    async def search(self, query: str, limit: Union[int, None], offset: Union[int, None],
+                     cursor: Union[str, None] = None, stream: bool = False):
+        if not self.repository.search_terms(query):
+            return 400, {
+                'message': "query must contain letters or digits"
+            }
+        if not offset:
+            offset = 0
+        try:
+            after = Cursor.decode(cursor, types=(float, int)) if cursor else None
+        except ValueError:
+            return 400, {
+                'message': "invalid cursor"
+            }
+        if stream:
+            return 200, NDJSON.encode(self.repository.stream_search(
+                query=query, limit=limit if limit and limit > 0 else None, offset=offset, after=after))
+        if not limit or not 0 < limit <= self.max_page_size:
+            limit = self.max_page_size
+        organizations, next_cursor = await self.repository.search(query=query, limit=limit, offset=offset,
+                                                                  after=after)
         return 200, {
             'message': "success",
             'content': {
-                "organizations": organizations
+                "organizations": organizations,
+                "next_cursor": next_cursor
             }
         }
@@ -1,121 +1,296 @@
+import re
 from typing import Union
-from sqlalchemy import text
+from uuid import UUID
+from src.app.components.activity.tree import ActivityTree
+from src.pkg.cursor.main import Cursor
+from src.pkg.geo.main import Geo, SpatialIndex
+from src.pkg.singleflight.main import SingleFlight, coalesced
+from src.pkg.statements.main import statements
 
 
 class OrganizationRepository:
-    def __init__(self, async_session):
+    def __init__(self, async_session, index: Union[SpatialIndex, None] = None,
+                 tree: Union[ActivityTree, None] = None,
+                 flight: Union[SingleFlight, None] = None, fuzzy: bool = True):
         self.async_session = async_session
+        self.index = index
+        self.tree = tree
+        self.flight = flight
+        self.fuzzy = fuzzy
+        self.trigrams = None
 
-    async def get_by_uuid(self, uuid: str):
+    @staticmethod
+    def _select(name: str, condition: str, source: str = "organization o", keys: str = "", order: str = "",
+                paginate: bool = False):
         """
-        Select organization by uuid
+        Organization query shared by all lookups: building and activity joined, phone numbers aggregated
+        per organization through a lateral subquery on the indexed phone_number.organization_id
         """
-        query = text(
-            """
-                SELECT o.uuid, o.name, b.uuid AS building_uuid, b.address, b.latitude, b.longitude, 
-                a.uuid AS activity_uuid, a.name AS activity_name,
-                (
-                    SELECT ARRAY_AGG(p.number) 
-                    FROM phone_number p 
-                    WHERE p.organization_id = o.id
-                ) AS phone_numbers
-                FROM organization o INNER JOIN building b ON o.building_id = b.id 
+        return statements.get(
+            name,
+            f"""
+                SELECT {keys + ", " if keys else ""}o.uuid, o.name, b.uuid AS building_uuid, b.address,
+                b.latitude, b.longitude, a.uuid AS activity_uuid, a.name AS activity_name, ph.phone_numbers
+                FROM {source} INNER JOIN building b ON o.building_id = b.id
                 INNER JOIN activity a ON o.activity_id = a.id
-                WHERE o.uuid = :uuid;
+                LEFT JOIN LATERAL (
+                    SELECT ARRAY_AGG(p.number) AS phone_numbers
+                    FROM phone_number p
+                    WHERE p.organization_id = o.id
+                ) ph ON TRUE
+                WHERE {condition}
+                {f"ORDER BY {order}" if order else ""}
+                {"LIMIT :limit OFFSET :offset" if paginate else ""};
             """
         )
+
+    @coalesced
+    async def get_by_uuid(self, uuid: UUID):
+        """
+        Select organization by uuid
+        """
+        query = self._select(name="organization.by_uuid", condition="o.uuid = :uuid")
         async with self.async_session() as session:
-            res = await session.execute(query, {"uuid": uuid})
+            res = await query.execute(session, {"uuid": uuid})
         row = res.fetchone()
         if not row:
             return
         return dict(row._mapping)
 
+    @coalesced
+    async def get_by_uuids(self, uuids: list[UUID]) -> dict:
+        """
+        Select organizations by list of uuids in one query, keyed by uuid
+        """
+        query = self._select(name="organization.by_uuids", condition="o.uuid = ANY(:uuids)")
+        async with self.async_session() as session:
+            res = await query.execute(session, {"uuids": uuids})
+        return {str(row.uuid): dict(row._mapping) for row in res.fetchall()}
+
+    @coalesced
     async def get_by_name(self, name: str):
         """
         Select organization by name
         """
-        query = text(
-            """
-                SELECT o.uuid, o.name, b.uuid AS building_uuid, b.address, b.latitude, b.longitude, 
-                a.uuid AS activity_uuid, a.name AS activity_name,
-                (
-                    SELECT ARRAY_AGG(p.number) 
-                    FROM phone_number p 
-                    WHERE p.organization_id = o.id
-                ) AS phone_numbers
-                FROM organization o INNER JOIN building b ON o.building_id = b.id 
-                INNER JOIN activity a ON o.activity_id = a.id
-                WHERE o.name = :name;
-            """
-        )
+        query = self._select(name="organization.by_name", condition="o.name = :name")
         async with self.async_session() as session:
-            res = await session.execute(query, {"name": name})
+            res = await query.execute(session, {"name": name})
         row = res.fetchone()
         if not row:
             return
         return dict(row._mapping)
 
-    async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: int, offset: int):
+    @staticmethod
+    def search_terms(query: str) -> Union[str, None]:
         """
-        Select all organizations in given radius in meters from point with given latitude and longitude
-        Uses Haversine formula
+        Prefix tsquery matching every word of query, or None if it has no words
         """
-        query = text(
-            """
-                SELECT o.uuid, o.name, b.uuid AS building_uuid, b.address, b.latitude, b.longitude, 
-                a.uuid AS activity_uuid, a.name AS activity_name,
-                (
-                    SELECT ARRAY_AGG(p.number) 
-                    FROM phone_number p 
-                    WHERE p.organization_id = o.id
-                ) AS phone_numbers
-                FROM organization o INNER JOIN building b ON o.building_id = b.id 
-                INNER JOIN activity a ON o.activity_id = a.id
-                WHERE (
-                    6378000 * acos(
-                        cos(radians(:latitude)) * cos(radians(b.latitude)) *
-                        cos(radians(b.longitude) - radians(:longitude)) +
-                        sin(radians(:latitude)) * sin(radians(b.latitude))
-                    )
-                ) <= :radius
-                LIMIT :limit OFFSET :offset;
-            """
-        )
+        words = re.findall(r"\w+", query.lower())
+        if not words:
+            return
+        return " & ".join(f"{word}:*" for word in words)
+
+    async def _has_trigrams(self) -> bool:
+        if self.trigrams is None:
+            query = statements.get(
+                "organization.search_trigrams",
+                """
+                    SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm');
+                """
+            )
+            async with self.async_session() as session:
+                res = await query.execute(session)
+            self.trigrams = res.scalar()
+        return self.trigrams
+
+    async def _search_query(self, query: str, limit: Union[int, None], offset: int, after: Union[list, None]):
+        """
+        Organizations whose name or building address contain words starting with the words of query,
+        or with pg_trgm installed are similar to it, ranked by exact name match, full-text rank and similarity
+        """
+        match = """
+            to_tsvector('simple', s.name) @@ q.query
+            OR to_tsvector('simple', sb.address) @@ q.query
+        """
+        rank = """
+            CASE WHEN lower(s.name) = lower(:query) THEN 1.0 ELSE 0.0 END
+            + 2 * ts_rank(to_tsvector('simple', s.name), q.query)
+            + ts_rank(to_tsvector('simple', sb.address), q.query)
+        """
+        if self.fuzzy and await self._has_trigrams():
+            match += " OR s.name % :query OR sb.address % :query"
+            rank += " + similarity(s.name, :query) + 0.5 * similarity(sb.address, :query)"
+        source = f"""
+            (
+                SELECT s.*, CAST({rank} AS float8) AS search_rank
+                FROM organization s INNER JOIN building sb ON s.building_id = sb.id,
+                to_tsquery('simple', :terms) AS q(query)
+                WHERE {match}
+            ) o
+        """
+        condition = "TRUE"
+        params = {"query": query, "terms": self.search_terms(query), "limit": limit, "offset": offset}
+        if after:
+            condition = "(o.search_rank < :after_rank OR (o.search_rank = :after_rank AND o.id > :after_id))"
+            params.update({"after_rank": after[0], "after_id": after[1]})
+        query = self._select(name="organization.search", condition=condition, source=source,
+                             keys="o.search_rank AS cursor_rank, o.id AS cursor_id",
+                             order="o.search_rank DESC, o.id", paginate=True)
+        return query, params
+
+    @coalesced
+    async def search(self, query: str, limit: int, offset: int, after: Union[list, None] = None):
+        """
+        Search organizations by name and building address with prefix, and if available fuzzy, matching
+        ordered by rank and id, starting after given cursor values
+        Returns the page and the cursor of the next one
+        """
+        query, params = await self._search_query(query=query, limit=limit + 1, offset=offset, after=after)
         async with self.async_session() as session:
-            res = await session.execute(
-                query, {"latitude": latitude, "longitude": longitude, "radius": radius, "limit": limit,
-                        "offset": offset})
-        rows = res.fetchall()
+            res = await query.execute(session, params)
+        rows, next_cursor = Cursor.page(rows=res.fetchall(), keys=("cursor_rank", "cursor_id"), limit=limit)
         if not rows:
-            return
-        return [dict(row._mapping) for row in rows]
+            return None, None
+        return rows, next_cursor
 
-    async def get_by_activity(self, activity: str, limit: int, offset: int):
+    async def stream_search(self, query: str, limit: Union[int, None], offset: int, after: Union[list, None] = None):
         """
-        Select all organizations with given activity name or an activity being child to given (3 levels deep)
+        Yield all organizations matching query in the order of search, fetched through a server-side cursor
         """
-        query = text(
+        query, params = await self._search_query(query=query, limit=limit, offset=offset, after=after)
+        async with self.async_session() as session:
+            res = await query.stream(session, params)
+            async for row in res:
+                yield Cursor.strip(row=row, keys=("cursor_rank", "cursor_id"))
+
+    def _in_radius_query(self, latitude: float, longitude: float, radius: float, limit: Union[int, None],
+                         offset: int, order_by_distance: bool, after: Union[list, None]):
+        params = {"limit": limit, "offset": offset}
+        if self.index is not None and self.index.ready:
+            building_ids, distances = self.index.query(latitude=latitude, longitude=longitude, radius=radius,
+                                                       order_by_distance=order_by_distance)
+            if not len(building_ids):
+                return None, None, None
+            source = """
+                unnest(CAST(:building_ids AS integer[]), CAST(:distances AS float8[])) AS d(building_id, distance)
+                INNER JOIN organization o ON o.building_id = d.building_id
             """
-                SELECT o.uuid, o.name, b.uuid AS building_uuid, b.address, b.latitude, b.longitude, 
-                a.uuid AS activity_uuid, a.name AS activity_name,
-                (
-                    SELECT ARRAY_AGG(p.number) 
-                    FROM phone_number p 
-                    WHERE p.organization_id = o.id
-                ) AS phone_numbers
-                FROM organization o INNER JOIN building b ON o.building_id = b.id 
-                INNER JOIN activity p_a ON o.activity_id = a.id
-                LEFT JOIN activity c1_a ON c1_a.parent_id = p_a.id
-                LEFT JOIN activity c2_a ON c2_a.parent_id = c1_a.id
-                LEFT JOIN activity c3_a ON c3_a.parent_id = c2_a.id
-                WHERE a.name = :activity OR c1_a.name = :activity OR c2_a.name = :activity OR c3_a.name = :activity     
-                LIMIT :limit OFFSET :offset;
+            condition = "TRUE"
+            distance = "d.distance"
+            params.update({"building_ids": building_ids.tolist(), "distances": distances.tolist()})
+        else:
+            source = "organization o"
+            distance = Geo.distance_sql("b")
+            condition = f"{Geo.bounding_box_sql('b')} AND {distance} <= :radius"
+            params.update({"latitude": latitude, "longitude": longitude, "radius": radius,
+                           **Geo.bounding_box(latitude=latitude, longitude=longitude, radius=radius)})
+        if order_by_distance:
+            keys, after_keys = ("cursor_distance", "cursor_id"), ("after_distance", "after_id")
+            columns = f"{distance} AS cursor_distance, o.id AS cursor_id"
+            keyset = f"({distance}, o.id) > (:after_distance, :after_id)"
+            order = f"{distance}, o.id"
+        else:
+            keys, after_keys = ("cursor_id",), ("after_id",)
+            columns = "o.id AS cursor_id"
+            keyset = "o.id > :after_id"
+            order = "o.id"
+        if after:
+            condition += f" AND {keyset}"
+            params.update(zip(after_keys, after))
+        query = self._select(name="organization.in_radius", condition=condition, source=source, keys=columns,
+                             order=order, paginate=True)
+        return query, params, keys
+
+    @coalesced
+    async def get_in_radius(self, latitude: float, longitude: float, radius: float, limit: int, offset: int,
+                            order_by_distance: bool = False, after: Union[list, None] = None):
+        """
+        Select all organizations in given radius in meters from point with given latitude and longitude
+        ordered by id, or by distance and id, starting after given cursor values
+        Buildings in radius are taken from the in-memory spatial index when it is loaded, otherwise prefiltered
+        by an indexed bounding box and then by the exact great-circle distance
+        Returns the page and the cursor of the next one
+        """
+        query, params, keys = self._in_radius_query(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit + 1, offset=offset,
+            order_by_distance=order_by_distance, after=after)
+        if query is None:
+            return None, None
+        async with self.async_session() as session:
+            res = await query.execute(session, params)
+        rows, next_cursor = Cursor.page(rows=res.fetchall(), keys=keys, limit=limit)
+        if not rows:
+            return None, None
+        return rows, next_cursor
+
+    async def stream_in_radius(self, latitude: float, longitude: float, radius: float, limit: Union[int, None],
+                               offset: int, order_by_distance: bool = False, after: Union[list, None] = None):
+        """
+        Yield all organizations in given radius in the order of get_in_radius, fetched through a server-side cursor
+        """
+        query, params, keys = self._in_radius_query(
+            latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset,
+            order_by_distance=order_by_distance, after=after)
+        if query is None:
+            return
+        async with self.async_session() as session:
+            res = await query.stream(session, params)
+            async for row in res:
+                yield Cursor.strip(row=row, keys=keys)
+
+    async def _by_activity_query(self, activity: str, limit: Union[int, None], offset: int,
+                                 after: Union[list, None]):
+        params = {"limit": limit, "offset": offset}
+        if self.tree is not None:
+            activity_ids = await self.tree.get_descendant_ids(name=activity)
+            if not activity_ids:
+                return None, None
+            condition = "o.activity_id = ANY(:activity_ids)"
+            params["activity_ids"] = activity_ids
+        else:
+            condition = """
+                o.activity_id IN (
+                    SELECT c.descendant_id
+                    FROM activity_closure c INNER JOIN activity t ON c.ancestor_id = t.id
+                    WHERE t.name = :activity
+                )
             """
-        )
+            params["activity"] = activity
+        if after:
+            condition += " AND o.id > :after_id"
+            params["after_id"] = after[0]
+        query = self._select(name="organization.by_activity", condition=condition, keys="o.id AS cursor_id",
+                             order="o.id", paginate=True)
+        return query, params
+
+    @coalesced
+    async def get_by_activity(self, activity: str, limit: int, offset: int, after: Union[list, None] = None):
+        """
+        Select all organizations with given activity name or an activity being its descendant at any depth
+        ordered by id, starting after the id of given cursor values
+        Descendants are expanded from the in-memory activity tree when it is enabled, otherwise resolved
+        through the activity_closure table
+        Returns the page and the cursor of the next one
+        """
+        query, params = await self._by_activity_query(activity=activity, limit=limit + 1, offset=offset, after=after)
+        if query is None:
+            return None, None
         async with self.async_session() as session:
-            res = await session.execute(query, {"activity": activity, "limit": limit, "offset": offset})
-        rows = res.fetchall()
+            res = await query.execute(session, params)
+        rows, next_cursor = Cursor.page(rows=res.fetchall(), keys=("cursor_id",), limit=limit)
         if not rows:
+            return None, None
+        return rows, next_cursor
+
+    async def stream_by_activity(self, activity: str, limit: Union[int, None], offset: int,
+                                 after: Union[list, None] = None):
+        """
+        Yield all organizations of given activity subtree ordered by id, fetched through a server-side cursor
+        """
+        query, params = await self._by_activity_query(activity=activity, limit=limit, offset=offset, after=after)
+        if query is None:
             return
-        return [dict(row._mapping) for row in rows]
+        async with self.async_session() as session:
+            res = await query.stream(session, params)
+            async for row in res:
+                yield Cursor.strip(row=row, keys=("cursor_id",))
@@ -1,66 +1,73 @@
 from typing import Optional
-from fastapi import APIRouter, Request, Response
+from uuid import UUID
+from fastapi import APIRouter, Body, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from src.app.components.middleware.main import Middleware
 from src.app.components.organization.controller import OrganizationController
 from src.pkg.logger.main import Logger
+from src.pkg.metrics.main import metrics
+from src.pkg.ndjson.main import NDJSON
+from src.pkg.response.main import FastJSONResponse
 
 
 class OrganizationRouter:
-    def __init__(self, controller: OrganizationController, cfg, logger: Logger, middleware: Middleware):
+    def __init__(self, controller: OrganizationController, cfg, logger: Logger):
         self.controller = controller
         self.cfg = cfg
         self.router = APIRouter()
         self.logger = logger
-        self.middleware = middleware
+        self.fast_json = cfg["app"].get("fast_json", False)
 
         @self.router.get('/by_uuid')
-        async def get_by_uuid(request: Request, response: Response, uuid: str):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
-
+        async def get_by_uuid(uuid: UUID):
             status_code, data = await self.controller.get_by_uuid(uuid=uuid)
-            response.status_code = status_code
-            return data
+            return self.respond(status_code=status_code, data=data)
 
-        @self.router.get('/by_name')
-        async def get_by_name(request: Request, response: Response, name: str):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
+        @self.router.post('/by_uuids')
+        async def get_by_uuids(uuids: list[UUID] = Body(..., embed=True)):
+            status_code, data = await self.controller.get_by_uuids(uuids=uuids)
+            return self.respond(status_code=status_code, data=data)
 
+        @self.router.get('/by_name')
+        async def get_by_name(name: str):
             status_code, data = await self.controller.get_by_name(name=name)
-            response.status_code = status_code
-            return data
+            return self.respond(status_code=status_code, data=data)
 
         @self.router.get('/in_radius')
-        async def get_in_radius(request: Request, response: Response, latitude: float, longitude: float, radius: float,
-                                limit: Optional[int] = None, offset: Optional[int] = None):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
-
+        async def get_in_radius(latitude: float, longitude: float, radius: float,
+                                limit: Optional[int] = Query(None, ge=1), offset: Optional[int] = Query(None, ge=0),
+                                order_by_distance: bool = False, cursor: Optional[str] = None,
+                                stream: bool = False):
             status_code, data = await self.controller.get_in_radius(
-                latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset)
-            response.status_code = status_code
-            return data
+                latitude=latitude, longitude=longitude, radius=radius, limit=limit, offset=offset,
+                order_by_distance=order_by_distance, cursor=cursor, stream=stream)
+            if stream and status_code == 200:
+                return StreamingResponse(data, media_type=NDJSON.media_type)
+            return self.respond(status_code=status_code, data=data)
 
         @self.router.get('/by_activity')
-        async def get_by_activity(request: Request, response: Response, activity: str,
-                                  limit: Optional[int] = None, offset: Optional[int] = None):
-            if not await self.middleware.authenticate(request.headers):
-                response.status_code = 401
-                return {
-                    'message': "authentication failed"
-                }
+        async def get_by_activity(activity: str,
+                                  limit: Optional[int] = Query(None, ge=1), offset: Optional[int] = Query(None, ge=0),
+                                  cursor: Optional[str] = None, stream: bool = False):
+            status_code, data = await self.controller.get_by_activity(activity=activity, limit=limit, offset=offset,
+                                                                      cursor=cursor, stream=stream)
+            if stream and status_code == 200:
+                return StreamingResponse(data, media_type=NDJSON.media_type)
+            return self.respond(status_code=status_code, data=data)
+
+        @self.router.get('/search')
+        async def search(query: str,
+                         limit: Optional[int] = Query(None, ge=1), offset: Optional[int] = Query(None, ge=0),
+                         cursor: Optional[str] = None, stream: bool = False):
+            status_code, data = await self.controller.search(query=query, limit=limit, offset=offset, cursor=cursor,
+                                                             stream=stream)
+            if stream and status_code == 200:
+                return StreamingResponse(data, media_type=NDJSON.media_type)
+            return self.respond(status_code=status_code, data=data)
 
-            status_code, data = await self.controller.get_by_activity(activity=activity, limit=limit, offset=offset)
-            response.status_code = status_code
-            return data
+    def respond(self, status_code: int, data: dict):
+        with metrics.timed("encoding"):
+            if self.fast_json:
+                return FastJSONResponse(content=data, status_code=status_code)
+            return JSONResponse(content=jsonable_encoder(data), status_code=status_code)
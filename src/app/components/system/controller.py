@@ -0,0 +1,31 @@
+from src.pkg.database.pool import PoolMetrics
+from src.pkg.database.replicas import ReplicaSet
+from src.pkg.logger.main import Logger
+from src.pkg.statements.main import Statements
+
+
+class SystemController:
+    def __init__(self, cfg: dict, logger: Logger, pool_metrics: PoolMetrics, replicas: ReplicaSet,
+                 statements: Statements):
+        self.cfg = cfg
+        self.logger = logger
+        self.pool_metrics = pool_metrics
+        self.replicas = replicas
+        self.statements = statements
+
+    async def get_pool(self):
+        return 200, {
+            'message': "success",
+            'content': {
+                "pool": self.pool_metrics.snapshot(),
+                "replicas": self.replicas.status()
+            }
+        }
+
+    async def get_statements(self):
+        return 200, {
+            'message': "success",
+            'content': {
+                "statements": self.statements.stats()
+            }
+        }
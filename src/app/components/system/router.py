@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Response
+
+from src.app.components.system.controller import SystemController
+from src.pkg.logger.main import Logger
+
+
+class SystemRouter:
+    def __init__(self, controller: SystemController, cfg, logger: Logger):
+        self.controller = controller
+        self.cfg = cfg
+        self.router = APIRouter()
+        self.logger = logger
+
+        @self.router.get('/pool')
+        async def get_pool(response: Response):
+            status_code, data = await self.controller.get_pool()
+            response.status_code = status_code
+            return data
+
+        @self.router.get('/statements')
+        async def get_statements(response: Response):
+            status_code, data = await self.controller.get_statements()
+            response.status_code = status_code
+            return data
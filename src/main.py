@@ -1,55 +1,182 @@
+import time
+import asyncio
+import contextlib
 import uvicorn
+from typing import Union
 from fastapi import FastAPI
+from config.main import Config
 from src.app.components.activity.controller import ActivityController
 from src.app.components.activity.repository import ActivityRepository
 from src.app.components.activity.router import ActivityRouter
+from src.app.components.activity.tree import ActivityTree
 from src.app.components.building.controller import BuildingController
 from src.app.components.building.repository import BuildingRepository
 from src.app.components.building.router import BuildingRouter
-from src.app.components.middleware.main import Middleware
+from src.app.components.metrics.controller import MetricsController
+from src.app.components.metrics.router import MetricsRouter
+from src.app.components.middleware.main import AuthMiddleware, Middleware
 from src.app.components.organization.controller import OrganizationController
 from src.app.components.organization.repository import OrganizationRepository
 from src.app.components.organization.router import OrganizationRouter
-from src.pkg.database.models import async_session, create_models
+from src.app.components.system.controller import SystemController
+from src.app.components.system.router import SystemRouter
+from src.pkg.cache.main import MemoryBackend, RedisBackend, ResponseCache
+from src.pkg.database.engine import database
+from src.pkg.database.models import async_session, Activity, Building, Organization, PhoneNumber
+from src.pkg.geo.main import SpatialIndex
 from src.pkg.hasher.main import Hasher
 from src.pkg.logger.main import Logger
+from src.pkg.metrics.main import metrics, MetricsMiddleware
+from src.pkg.singleflight.main import SingleFlight
+from src.pkg.statements.main import statements
 
 
 class App:
     def __init__(self, cfg: dict, logger: Logger):
         self.cfg = cfg
+        self.logger = logger
+        if not database.configured:
+            database.configure(cfg["database"])
+
+        metrics.enabled = cfg.get("metrics", {}).get("enabled", False)
 
         hasher = Hasher()
-        middleware = Middleware(hasher=hasher)
+        self.middleware = Middleware(hasher=hasher, cfg=cfg, logger=logger)
+
+        geo_cfg = cfg.get("geo", {})
+        building_index = None
+        if geo_cfg.get("in_memory_index"):
+            building_index = SpatialIndex(cell_size=geo_cfg.get("cell_size", 0.05))
+
+        cache_cfg = cfg.get("cache", {})
+        self.cache = None
+        if cache_cfg.get("enabled"):
+            if cache_cfg.get("backend") == "redis":
+                backend = RedisBackend(url=cache_cfg["redis_url"], ttl=cache_cfg.get("ttl", 60))
+            else:
+                backend = MemoryBackend(maxsize=cache_cfg.get("size", 10000), ttl=cache_cfg.get("ttl", 60))
+            self.cache = ResponseCache(backend=backend, ttl=cache_cfg.get("ttl", 60))
+            for model in (Activity, Building, Organization, PhoneNumber):
+                self.cache.watch(model)
+
+        activity_cfg = cfg.get("activity", {})
+        self.activity_tree = None
+        if activity_cfg.get("in_memory_tree"):
+            shared = self.cache.backend if self.cache is not None and cache_cfg.get("backend") == "redis" else None
+            self.activity_tree = ActivityTree(async_session=async_session,
+                                              refresh_interval=activity_cfg.get("refresh_interval"), shared=shared)
 
-        activity_repository = ActivityRepository(async_session=async_session)
-        building_repository = BuildingRepository(async_session=async_session)
-        organization_repository = OrganizationRepository(async_session=async_session)
+        flight = SingleFlight() if cfg["app"].get("single_flight", True) else None
 
-        activity_controller = ActivityController(cfg=self.cfg, logger=logger, repository=activity_repository)
-        building_controller = BuildingController(cfg=self.cfg, logger=logger, repository=building_repository)
+        activity_repository = ActivityRepository(async_session=database.read_session, tree=self.activity_tree,
+                                                 flight=flight)
+        self.building_repository = BuildingRepository(async_session=database.read_session, index=building_index,
+                                                      pre_encode=cfg["app"].get("fast_json", False), flight=flight)
+        organization_repository = OrganizationRepository(async_session=database.read_session,
+                                                         index=building_index, tree=self.activity_tree, flight=flight,
+                                                         fuzzy=cfg.get("search", {}).get("fuzzy", True))
+
+        activity_controller = ActivityController(cfg=self.cfg, logger=logger, repository=activity_repository,
+                                                 cache=self.cache)
+        building_controller = BuildingController(cfg=self.cfg, logger=logger,
+                                                 repository=self.building_repository, cache=self.cache)
         organization_controller = OrganizationController(cfg=self.cfg, logger=logger,
-                                                         repository=organization_repository)
+                                                         repository=organization_repository, cache=self.cache)
+        system_controller = SystemController(cfg=self.cfg, logger=logger, pool_metrics=database.pool_metrics,
+                                             replicas=database.replicas, statements=statements)
 
-        self.app = FastAPI()
+        self.replica_monitor = None
+        self.keys_refresh = None
+        self.index_refresh = None
+        self.app = FastAPI(lifespan=self.lifespan)
         self.app.include_router(
             ActivityRouter(
-                cfg=cfg, controller=activity_controller, logger=logger, middleware=middleware).router,
+                cfg=cfg, controller=activity_controller, logger=logger).router,
                 prefix="/activity"
         )
         self.app.include_router(
             BuildingRouter(
-                cfg=cfg, controller=building_controller, logger=logger, middleware=middleware).router,
+                cfg=cfg, controller=building_controller, logger=logger).router,
                 prefix="/building"
         )
         self.app.include_router(
             OrganizationRouter(
-                cfg=cfg, controller=organization_controller, logger=logger, middleware=middleware).router,
+                cfg=cfg, controller=organization_controller, logger=logger).router,
                 prefix="/organization"
         )
+        self.app.include_router(
+            SystemRouter(
+                cfg=cfg, controller=system_controller, logger=logger).router,
+                prefix="/system"
+        )
+        self.app.add_middleware(AuthMiddleware, middleware=self.middleware)
+        if metrics.enabled:
+            metrics_controller = MetricsController(cfg=self.cfg, logger=logger, metrics=metrics,
+                                                   pool_metrics=database.pool_metrics, replicas=database.replicas,
+                                                   statements=statements, cache=self.cache)
+            self.app.include_router(MetricsRouter(cfg=cfg, controller=metrics_controller, logger=logger).router)
+            self.app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    async def startup(self):
+        """
+        Warm up the pools and in-memory state of this worker and start its background tasks
+        Schema is managed by alembic and test data by seed.py, neither is touched here
+        """
+        started_at = time.monotonic()
+        await database.warm_up(connections=self.cfg["database"].get("pool", {}).get("warm_up", 10))
+        await self.middleware.preload()
+        self.keys_refresh = asyncio.create_task(self.middleware.refresh())
+        if self.building_repository.index is not None:
+            await self.building_repository.load_index()
+            refresh_interval = self.cfg.get("geo", {}).get("refresh_interval")
+            if refresh_interval:
+                self.index_refresh = asyncio.create_task(
+                    self.building_repository.refresh_index(interval=refresh_interval))
+        if self.activity_tree is not None:
+            await self.activity_tree.load()
+        if database.replicas.replicas:
+            self.replica_monitor = asyncio.create_task(
+                database.replicas.monitor(interval=self.cfg["database"].get("replica_check_interval", 5)))
+        self.logger.info("startup finished in %.3fs", time.monotonic() - started_at)
+
+    async def shutdown(self):
+        if self.keys_refresh is not None:
+            self.keys_refresh.cancel()
+        if self.index_refresh is not None:
+            self.index_refresh.cancel()
+        if self.replica_monitor is not None:
+            self.replica_monitor.cancel()
+        await database.dispose()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        await self.startup()
+        yield
+        await self.shutdown()
 
     async def run(self):
-        await create_models(insert_test_data=True) # Set True to insert test rows into tables
-        config = uvicorn.Config(self.app, host=self.cfg["app"]["host"], port=self.cfg["app"]["port"])
+        config = uvicorn.Config(self.app, host=self.cfg["app"]["host"], port=self.cfg["app"]["port"],
+                                timeout_graceful_shutdown=self.cfg["app"].get("graceful_shutdown_timeout", 30))
         server = uvicorn.Server(config)
         await server.serve()
+
+
+def create_app(cfg: Union[dict, None] = None, logger: Union[Logger, None] = None) -> FastAPI:
+    """
+    Application factory: config is loaded once here unless given, engines are built by App and connect lazily
+    Used by uvicorn worker processes, each building its own engines, caches and indexes
+    """
+    if cfg is None:
+        cfg = Config("config/config.yml").load()
+    if logger is None:
+        logger = Logger(filename='organization-app.log', name='ORG-APP', cfg=cfg)
+    return App(cfg, logger).app
+
+
+def run_workers(cfg: dict):
+    """
+    Serve the app from app.workers processes
+    """
+    uvicorn.run("src.main:create_app", factory=True, host=cfg["app"]["host"], port=cfg["app"]["port"],
+                workers=cfg["app"]["workers"],
+                timeout_graceful_shutdown=cfg["app"].get("graceful_shutdown_timeout", 30))
@@ -0,0 +1,151 @@
+import time
+import orjson
+import functools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Union
+
+
+class TTLCache:
+    _missing = object()
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Return cached value for key, or default if it is missing or expired
+        """
+        item = self._data.get(key, self._missing)
+        if item is self._missing:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Union[float, None] = None):
+        """
+        Store value for key, evicting least recently used entries above maxsize
+        """
+        if ttl is None:
+            ttl = self.ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 10000, ttl: float = 60):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions = {}
+
+    async def get(self, key: str) -> Any:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Union[float, None] = None):
+        self.cache.set(key, value, ttl=ttl)
+
+    async def get_versions(self, tags: tuple) -> list:
+        return [self.versions.get(tag, 0) for tag in tags]
+
+    async def bump(self, tag: str):
+        self.versions[tag] = self.versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: float = 60, prefix: str = "organization-api"):
+        from redis import asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        value = await self.client.get(f"{self.prefix}:response:{key}")
+        if value is None:
+            return
+        return orjson.loads(value)
+
+    async def set(self, key: str, value: Any, ttl: Union[float, None] = None):
+        await self.client.set(f"{self.prefix}:response:{key}", orjson.dumps(value, default=str),
+                              px=int((ttl or self.ttl) * 1000))
+
+    async def get_versions(self, tags: tuple) -> list:
+        versions = await self.client.mget([f"{self.prefix}:tag:{tag}" for tag in tags])
+        return [int(version or 0) for version in versions]
+
+    async def bump(self, tag: str):
+        await self.client.incr(f"{self.prefix}:tag:{tag}")
+
+
+class ResponseCache:
+    def __init__(self, backend: Union[MemoryBackend, RedisBackend], ttl: float = 60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = {}
+        self.misses = {}
+
+    def watch(self, model):
+        """
+        Invalidate the tag named after the model table whenever its rows are written through Base
+        """
+        async def invalidate(event: str, values: dict):
+            await self.invalidate(model.__tablename__)
+
+        model.subscribe(invalidate)
+
+    async def invalidate(self, tag: str):
+        await self.backend.bump(tag)
+
+    async def get_or_set(self, name: str, params: dict, tags: tuple, func: Callable[[], Awaitable]) -> Any:
+        """
+        Return cached result of func for given name and params, keyed by the current versions of tags
+        """
+        versions = await self.backend.get_versions(tags)
+        key = f"{name}:{sorted(params.items())!r}:{versions!r}"
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            return value
+        self.misses[name] = self.misses.get(name, 0) + 1
+        value = await func()
+        await self.backend.set(key, value, ttl=self.ttl)
+        return value
+
+    def stats(self) -> dict:
+        return {
+            name: {"hits": self.hits.get(name, 0), "misses": self.misses.get(name, 0)}
+            for name in sorted(set(self.hits) | set(self.misses))
+        }
+
+
+def cached(*tags: str):
+    """
+    Cache results of a controller method in its self.cache, invalidated by writes to given tables
+    Streamed results are never cached
+    """
+    def decorator(method):
+        name = method.__qualname__
+
+        @functools.wraps(method)
+        async def wrapper(self, **kwargs):
+            if self.cache is None or kwargs.get("stream"):
+                return await method(self, **kwargs)
+            return await self.cache.get_or_set(name=name, params=kwargs, tags=tags,
+                                               func=lambda: method(self, **kwargs))
+        return wrapper
+    return decorator
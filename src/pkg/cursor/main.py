@@ -0,0 +1,65 @@
+import json
+import math
+import base64
+import binascii
+from typing import Union
+from src.pkg.metrics.main import metrics
+
+INT4_MIN, INT4_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class Cursor:
+    def __init__(self):
+        return
+
+    @staticmethod
+    def encode(values: list) -> str:
+        data = json.dumps(values, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode(cursor: str, types: tuple) -> list:
+        """
+        Decode an opaque cursor into its key values of given types, raising ValueError if it is malformed
+        int positions hold ids and must fit int4, float positions hold distances or ranks and must be finite
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("invalid cursor")
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("invalid cursor")
+        return [Cursor._value(value=value, kind=kind) for value, kind in zip(values, types)]
+
+    @staticmethod
+    def _value(value, kind: type):
+        if isinstance(value, bool):
+            raise ValueError("invalid cursor")
+        if kind is int:
+            if not isinstance(value, int) or not INT4_MIN <= value <= INT4_MAX:
+                raise ValueError("invalid cursor")
+            return value
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError("invalid cursor")
+        return float(value)
+
+    @staticmethod
+    def page(rows: list, keys: tuple, limit: int) -> tuple[list, Union[str, None]]:
+        """
+        Split rows fetched with limit + 1 into a page and the cursor of its last row, dropping key columns
+        """
+        with metrics.timed("mapping"):
+            next_cursor = None
+            if len(rows) > limit:
+                next_cursor = Cursor.encode([rows[limit - 1]._mapping[key] for key in keys])
+            return [Cursor.strip(row=row, keys=keys) for row in rows[:limit]], next_cursor
+
+    @staticmethod
+    def strip(row, keys: tuple) -> dict:
+        """
+        Row as dict without its key columns
+        """
+        item = dict(row._mapping)
+        for key in keys:
+            del item[key]
+        return item
@@ -0,0 +1,112 @@
+import os
+import asyncio
+from typing import Union
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from config.main import Config
+from src.pkg.database.pool import MeteredPool, PoolMetrics
+from src.pkg.database.replicas import ReplicaSet
+
+
+def database_url(database_cfg: dict) -> str:
+    return (f"postgresql+asyncpg://{database_cfg['user']}:{database_cfg['password']}@{database_cfg['host']}:"
+            f"{database_cfg['port']}/{database_cfg['name']}")
+
+
+def build_engine(url: str, database_cfg: dict):
+    """
+    Async engine with pool and asyncpg statement cache settings from the database section of config
+    Prepared statements can be turned off for transaction-pooling proxies such as pgbouncer
+    """
+    pool_cfg = database_cfg.get("pool", {})
+    statement_cache_size = database_cfg.get("statement_cache_size", 100)
+    if not database_cfg.get("prepared_statements", True):
+        statement_cache_size = 0
+    return create_async_engine(url,
+                               poolclass=MeteredPool,
+                               pool_size=pool_cfg.get("size", 100),
+                               max_overflow=pool_cfg.get("max_overflow", 50),
+                               pool_timeout=pool_cfg.get("timeout", 30),
+                               pool_recycle=pool_cfg.get("recycle", -1),
+                               pool_pre_ping=pool_cfg.get("pre_ping", False),
+                               connect_args={"statement_cache_size": statement_cache_size,
+                                             "prepared_statement_cache_size": statement_cache_size})
+
+
+class Database:
+    def __init__(self, config_path: str = "config/config.yml"):
+        self.config_path = config_path
+        self.engine = None
+        self.engines = []
+        self.primary = None
+        self.replicas: Union[ReplicaSet, None] = None
+        self.pool_metrics = PoolMetrics()
+
+    @property
+    def configured(self) -> bool:
+        return self.engine is not None
+
+    def configure(self, database_cfg: dict):
+        """
+        Build the primary and replica engines; nothing connects until the first session is used
+        """
+        self.engine = build_engine(database_url(database_cfg), database_cfg)
+        self.pool_metrics.attach(self.engine)
+        self.primary = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.engines = [self.engine]
+        replicas = []
+        for replica_cfg in database_cfg.get("replicas", []):
+            replica_cfg = {**database_cfg, **replica_cfg}
+            self.engines.append(build_engine(database_url(replica_cfg), replica_cfg))
+            replicas.append((f"{replica_cfg['host']}:{replica_cfg['port']}",
+                             async_sessionmaker(self.engines[-1], expire_on_commit=False)))
+        self.replicas = ReplicaSet(primary=self.primary, replicas=replicas,
+                                   read_your_writes=database_cfg.get("read_your_writes", 0))
+
+    def ensure(self):
+        """
+        Configure from the config file for scripts and tools that use models without building the app
+        """
+        if not self.configured:
+            self.configure(Config(self.config_path).load()["database"])
+
+    def session(self):
+        self.ensure()
+        return self.primary()
+
+    def read_session(self):
+        self.ensure()
+        return self.replicas()
+
+    def pin(self):
+        if self.replicas is not None:
+            self.replicas.pin()
+
+    def reset_pools(self):
+        """
+        Drop pooled connections inherited from the parent process without closing them, so that a forked worker
+        opens its own connections instead of sharing the parent's sockets
+        """
+        for engine in self.engines:
+            engine.sync_engine.dispose(close=False)
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+    async def warm_up(self, connections: int):
+        """
+        Open up to given number of pooled connections on every engine so that first requests do not pay for
+        connecting
+        """
+        async def ping(engine):
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        self.ensure()
+        await asyncio.gather(*[ping(engine) for engine in self.engines
+                               for _ in range(min(connections, engine.pool.size()))])
+
+
+database = Database()
+os.register_at_fork(after_in_child=database.reset_pools)
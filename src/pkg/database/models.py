@@ -1,35 +1,69 @@
 import uuid
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import inspect
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import (Column, Integer, String, func, ForeignKey, UUID, select, update, Float, delete, and_,
-                        CheckConstraint)
-from config.main import Config
+                        CheckConstraint, Index, text, inspect as inspect_instance)
+from src.pkg.database.engine import database
 from src.pkg.hasher.main import Hasher
 
 hasher = Hasher()
 
-cfg = Config("config/config.yml").load()
 
-url = (f"postgresql+asyncpg://{cfg['database']['user']}:{cfg['database']['password']}@{cfg['database']['host']}:"
-       f"{cfg['database']['port']}/{cfg['database']['name']}")
+def async_session():
+    """
+    Session on the primary database
+    """
+    return database.session()
 
-engine = create_async_engine(url,
-                             pool_size=100,
-                             max_overflow=50)
 
-async_session = async_sessionmaker(engine, expire_on_commit=False)
+subscribers = {}
 
 
 class Base(declarative_base()):
     __abstract__ = True
-    async_session = async_session
+    async_session = staticmethod(async_session)
+
+    @classmethod
+    def subscribe(cls, callback):
+        """
+        Register callback(event, values), plain or async, called after rows of this model are saved, updated or deleted
+        """
+        subscribers.setdefault(cls.__tablename__, []).append(callback)
+
+    @classmethod
+    async def notify(cls, event: str, values: dict):
+        database.pin()
+        for callback in subscribers.get(cls.__tablename__, []):
+            result = callback(event, values)
+            if inspect.isawaitable(result):
+                await result
+
+    async def on_save(self, session, created: bool, changed: set):
+        """
+        Hook called inside the save transaction after the row is flushed, with whether the row is new
+        and names of the attributes changed since it was loaded
+        """
+        return
+
+    @classmethod
+    async def on_update(cls, session, fields: dict):
+        """
+        Hook called inside the update transaction after the rows are updated
+        """
+        return
 
     async def save(self):
+        state = inspect_instance(self)
+        created = not state.has_identity
+        changed = {attr.key for attr in state.attrs if attr.history.has_changes()}
         async with self.async_session() as session:
             session.add(self)
+            await session.flush()
+            await self.on_save(session, created=created, changed=changed)
             await session.commit()
             await session.refresh(self)
-            return self
+        await self.notify("save", {column.name: getattr(self, column.name) for column in self.__table__.columns})
+        return self
 
     @classmethod
     async def delete(cls, **kwargs):
@@ -38,6 +72,7 @@ class Base(declarative_base()):
         async with cls.async_session() as session:
             await session.execute(query)
             await session.commit()
+        await cls.notify("delete", kwargs)
 
     @classmethod
     async def get(cls, **kwargs):
@@ -77,15 +112,17 @@ class Base(declarative_base()):
                 query = query.where(*conditions)
             query = query.values(fields)
             res = await session.execute(query)
+            await cls.on_update(session, fields=fields)
             await session.commit()
-            return res.rowcount
+        await cls.notify("update", {**kwargs, **fields})
+        return res.rowcount
 
 
 class ApiKey(Base):
     __tablename__ = 'api_key'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    hashed_key = Column(String, nullable=False)
+    hashed_key = Column(String, nullable=False, unique=True, index=True)
 
     def __init__(self, key):
         self.hashed_key = hasher.get_hash(key)
@@ -95,7 +132,7 @@ class Building(Base):
     __tablename__ = 'building'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    uuid = Column(UUID, default=uuid.uuid4)
+    uuid = Column(UUID, default=uuid.uuid4, unique=True, index=True)
     address = Column(String, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
@@ -103,6 +140,8 @@ class Building(Base):
     __table_args__ = (
         CheckConstraint('latitude >= -90 AND latitude <= 90', name='check_latitude'),
         CheckConstraint('longitude >= -180 AND longitude <= 180', name='check_longitude'),
+        Index('ix_building_latitude_longitude', 'latitude', 'longitude'),
+        Index('ix_building_address_tsv', text("to_tsvector('simple', address)"), postgresql_using='gin'),
     )
 
     def __init__(self, address, latitude, longitude):
@@ -115,23 +154,154 @@ class Activity(Base):
     __tablename__ = 'activity'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    uuid = Column(UUID, default=uuid.uuid4)
-    name = Column(String, nullable=False)
+    uuid = Column(UUID, default=uuid.uuid4, unique=True, index=True)
+    name = Column(String, nullable=False, index=True)
     parent_id = Column(Integer, ForeignKey('activity.id'), nullable=True, index=True)
 
     def __init__(self, name, parent_id=None):
         self.name = name
         self.parent_id = parent_id
 
+    async def on_save(self, session, created: bool, changed: set):
+        if created:
+            await ActivityClosure.insert(session=session, activity_id=self.id, parent_id=self.parent_id)
+        elif "parent_id" in changed:
+            await ActivityClosure.move(session=session, activity_id=self.id, parent_id=self.parent_id)
+
+    @classmethod
+    async def on_update(cls, session, fields: dict):
+        """
+        Recompute the closure in the update transaction, so that no reader sees new parents with old closure rows
+        """
+        if "parent_id" not in fields:
+            return
+        if fields["parent_id"] is not None:
+            await ActivityClosure.check_parent(session=session, parent_id=fields["parent_id"])
+        await ActivityClosure.rebuild(session=session)
+
+
+class ActivityClosure(Base):
+    __tablename__ = 'activity_closure'
+
+    ancestor_id = Column(Integer, ForeignKey(Activity.id, ondelete='CASCADE'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey(Activity.id, ondelete='CASCADE'), primary_key=True, index=True)
+    depth = Column(Integer, nullable=False)
+
+    @staticmethod
+    async def insert(session, activity_id: int, parent_id: int = None):
+        """
+        Link a new activity to itself and to every ancestor of its parent
+        """
+        query = text(
+            """
+                INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+                SELECT c.ancestor_id, CAST(:activity_id AS integer), c.depth + 1
+                FROM activity_closure c
+                WHERE c.descendant_id = :parent_id
+                UNION ALL
+                SELECT CAST(:activity_id AS integer), CAST(:activity_id AS integer), 0;
+            """
+        )
+        await session.execute(query, {"activity_id": activity_id, "parent_id": parent_id})
+
+    @staticmethod
+    async def move(session, activity_id: int, parent_id: int = None):
+        """
+        Relink the subtree of an activity whose parent has changed: drop its links to the old ancestors
+        and link every node of the subtree to every ancestor of the new parent
+        """
+        res = await session.execute(
+            text("SELECT 1 FROM activity_closure WHERE ancestor_id = :activity_id AND descendant_id = :parent_id;"),
+            {"activity_id": activity_id, "parent_id": parent_id})
+        if res.first() is not None:
+            raise ValueError("Activity can not be moved under itself or its descendant")
+        await session.execute(
+            text(
+                """
+                    DELETE FROM activity_closure
+                    WHERE descendant_id IN (
+                        SELECT descendant_id FROM activity_closure WHERE ancestor_id = :activity_id
+                    )
+                    AND ancestor_id NOT IN (
+                        SELECT descendant_id FROM activity_closure WHERE ancestor_id = :activity_id
+                    );
+                """
+            ),
+            {"activity_id": activity_id})
+        await session.execute(
+            text(
+                """
+                    INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+                    SELECT p.ancestor_id, s.descendant_id, p.depth + s.depth + 1
+                    FROM activity_closure p CROSS JOIN activity_closure s
+                    WHERE p.descendant_id = :parent_id AND s.ancestor_id = :activity_id;
+                """
+            ),
+            {"activity_id": activity_id, "parent_id": parent_id})
+
+    @staticmethod
+    async def check_parent(session, parent_id: int):
+        """
+        Reject an update that made parent_id the parent of activities it already descends from,
+        checked against the closure as it was before the update
+        """
+        res = await session.execute(
+            text(
+                """
+                    SELECT 1
+                    FROM activity a INNER JOIN activity_closure c ON c.ancestor_id = a.id
+                    WHERE a.parent_id = :parent_id AND c.descendant_id = :parent_id
+                    LIMIT 1;
+                """
+            ),
+            {"parent_id": parent_id})
+        if res.first() is not None:
+            raise ValueError("Activity can not be moved under itself or its descendant")
+
+    @classmethod
+    async def rebuild(cls, session=None):
+        """
+        Recompute the whole closure from activity.parent_id, in given session without committing,
+        or in a transaction of its own
+        Depth is capped by the number of activities, so a parent_id cycle ends in a primary key violation
+        instead of endless recursion
+        """
+        query = text(
+            """
+                INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+                WITH RECURSIVE tree AS (
+                    SELECT a.id AS ancestor_id, a.id AS descendant_id, 0 AS depth
+                    FROM activity a
+                    UNION ALL
+                    SELECT t.ancestor_id, a.id, t.depth + 1
+                    FROM tree t INNER JOIN activity a ON a.parent_id = t.descendant_id
+                    WHERE t.depth < (SELECT count(*) FROM activity)
+                )
+                SELECT t.ancestor_id, t.descendant_id, t.depth FROM tree t;
+            """
+        )
+        if session is not None:
+            await session.execute(delete(cls))
+            await session.execute(query)
+            return
+        async with cls.async_session() as session:
+            await session.execute(delete(cls))
+            await session.execute(query)
+            await session.commit()
+
 
 class Organization(Base):
     __tablename__ = 'organization'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    uuid = Column(UUID, default=uuid.uuid4)
-    name = Column(String, nullable=False)
-    building_id = Column(Integer, ForeignKey(Building.id), nullable=False)
-    activity_id = Column(Integer, ForeignKey(Activity.id), nullable=False)
+    uuid = Column(UUID, default=uuid.uuid4, unique=True, index=True)
+    name = Column(String, nullable=False, index=True)
+    building_id = Column(Integer, ForeignKey(Building.id), nullable=False, index=True)
+    activity_id = Column(Integer, ForeignKey(Activity.id), nullable=False, index=True)
+
+    __table_args__ = (
+        Index('ix_organization_name_tsv', text("to_tsvector('simple', name)"), postgresql_using='gin'),
+    )
 
     def __init__(self, name, building_id, activity_id):
         self.name = name
@@ -144,7 +314,7 @@ class PhoneNumber(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     number = Column(String, nullable=False)
-    organization_id = Column(Integer, ForeignKey(Organization.id), nullable=False)
+    organization_id = Column(Integer, ForeignKey(Organization.id), nullable=False, index=True)
 
     def __init__(self, number, organization_id):
         self.number = number
@@ -153,7 +323,8 @@ class PhoneNumber(Base):
 
 async def insert_data():
     key = "A5z~V2g+T8f*D0m^L!1"
-    await ApiKey(key=key).save()
+    if not await ApiKey.get(hashed_key=hasher.get_hash(key)):
+        await ApiKey(key=key).save()
 
     building = await Building.get(address="Пятницкая улица, 10 ст1", latitude=55.743748, longitude=37.62795)
     if not building:
@@ -178,11 +349,3 @@ async def insert_data():
 
     if not await PhoneNumber.get(number="+7‒915‒765‒XX‒XX", organization_id=organization.id):
         await PhoneNumber(number="+7‒915‒765‒XX‒XX", organization_id=organization.id).save()
-
-
-async def create_models(insert_test_data: bool=False):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-
-    if insert_test_data:
-        await insert_data()
@@ -0,0 +1,84 @@
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.pkg.metrics.main import metrics
+
+
+class PoolMetrics:
+    def __init__(self):
+        self.pool = None
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def attach(self, engine):
+        """
+        Collect metrics of the engine pool through pool events and the timed checkout of MeteredPool
+        """
+        self.pool = engine.pool
+        engine.pool.metrics = self
+        event.listen(engine.sync_engine, "connect", self.on_connect)
+        event.listen(engine.sync_engine, "checkout", self.on_checkout)
+        event.listen(engine.sync_engine, "invalidate", self.on_invalidate)
+        event.listen(engine.sync_engine, "engine_disposed", self.on_disposed)
+
+    def on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidations += 1
+
+    def on_disposed(self, engine):
+        self.pool = engine.pool
+
+    def waited(self, seconds: float):
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "checked_in": pool.checkedin() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": self.wait_total,
+            "wait_seconds_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            "wait_seconds_max": self.wait_max,
+        }
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    metrics = None
+
+    def connect(self):
+        """
+        Check out a connection, reporting the time spent waiting for it and checkout timeouts to metrics
+        """
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.timeouts += 1
+            raise
+        finally:
+            seconds = time.perf_counter() - started_at
+            if self.metrics is not None:
+                self.metrics.waited(seconds)
+            metrics.stage("checkout", seconds)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
@@ -0,0 +1,60 @@
+import time
+import asyncio
+import contextvars
+from sqlalchemy import text
+
+pinned_until = contextvars.ContextVar("pinned_until", default=0.0)
+
+
+class ReplicaSet:
+    def __init__(self, primary, replicas: list, read_your_writes: float = 0, check_timeout: float = 2):
+        """
+        primary and replicas are session factories; replicas is a list of (name, session factory)
+        """
+        self.primary = primary
+        self.replicas = replicas
+        self.read_your_writes = read_your_writes
+        self.check_timeout = check_timeout
+        self.healthy = {name: True for name, _ in replicas}
+        self.counter = 0
+
+    def __call__(self):
+        """
+        Session for a read: next healthy replica in round-robin order, or the primary when there is none
+        or the current context wrote recently and read-your-writes pinning is on
+        """
+        if not self.replicas or pinned_until.get() > time.monotonic():
+            return self.primary()
+        for _ in range(len(self.replicas)):
+            name, session = self.replicas[self.counter % len(self.replicas)]
+            self.counter += 1
+            if self.healthy[name]:
+                return session()
+        return self.primary()
+
+    def pin(self):
+        """
+        Route reads of the current context to the primary for read_your_writes seconds
+        """
+        if self.read_your_writes:
+            pinned_until.set(time.monotonic() + self.read_your_writes)
+
+    async def check(self):
+        for name, session in self.replicas:
+            try:
+                async with session() as s:
+                    await asyncio.wait_for(s.execute(text("SELECT 1")), timeout=self.check_timeout)
+                self.healthy[name] = True
+            except Exception:
+                self.healthy[name] = False
+
+    async def monitor(self, interval: float):
+        """
+        Check replicas every interval seconds, taking failed ones out of rotation until they answer again
+        """
+        while True:
+            await self.check()
+            await asyncio.sleep(interval)
+
+    def status(self) -> dict:
+        return dict(self.healthy)
@@ -0,0 +1,192 @@
+import math
+import numpy as np
+
+EARTH_RADIUS = 6378000
+
+
+class Geo:
+    def __init__(self):
+        return
+
+    @staticmethod
+    def distance_sql(alias: str) -> str:
+        """
+        Great-circle distance in meters between :latitude/:longitude and the coordinates of given table alias
+        """
+        return f"""
+            {EARTH_RADIUS} * acos(least(1.0, greatest(-1.0,
+                cos(radians(:latitude)) * cos(radians({alias}.latitude)) *
+                cos(radians({alias}.longitude) - radians(:longitude)) +
+                sin(radians(:latitude)) * sin(radians({alias}.latitude))
+            )))
+        """
+
+    @staticmethod
+    def bounding_box_sql(alias: str) -> str:
+        return f"""
+            {alias}.latitude BETWEEN :min_latitude AND :max_latitude
+            AND {alias}.longitude BETWEEN :min_longitude AND :max_longitude
+        """
+
+    @staticmethod
+    def bounding_box(latitude: float, longitude: float, radius: float) -> dict:
+        """
+        Latitude/longitude bounds enclosing the circle of given radius in meters around the point
+        Falls back to the full longitude range near the poles and across the antimeridian
+        """
+        angle = radius / EARTH_RADIUS
+        delta = math.degrees(angle)
+        min_latitude, max_latitude = latitude - delta, latitude + delta
+        min_longitude, max_longitude = -180.0, 180.0
+        if min_latitude > -90 and max_latitude < 90:
+            longitude_delta = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(latitude)))))
+            if longitude - longitude_delta >= -180 and longitude + longitude_delta <= 180:
+                min_longitude, max_longitude = longitude - longitude_delta, longitude + longitude_delta
+        return {
+            "min_latitude": max(min_latitude, -90.0),
+            "max_latitude": min(max_latitude, 90.0),
+            "min_longitude": min_longitude,
+            "max_longitude": max_longitude,
+        }
+
+
+class SpatialIndex:
+    def __init__(self, cell_size: float = 0.05, merge_threshold: int = 1024):
+        self.cell_size = cell_size
+        self.merge_threshold = merge_threshold
+        self.columns = int(math.ceil(360 / cell_size)) + 1
+        self.ready = False
+        self.rows = {}
+        self._reset()
+
+    def _reset(self):
+        self.cells = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.latitudes = np.empty(0, dtype=np.float64)
+        self.longitudes = np.empty(0, dtype=np.float64)
+        self.dead = np.zeros(0, dtype=bool)
+        self.pending = ([], [], [])
+        self.pending_dead = []
+        self.slots = {}
+        self.dead_count = 0
+
+    def _cell(self, latitudes, longitudes):
+        rows = np.floor((np.asarray(latitudes) + 90) / self.cell_size).astype(np.int64)
+        columns = np.floor((np.asarray(longitudes) + 180) / self.cell_size).astype(np.int64)
+        return rows * self.columns + columns
+
+    def load(self, points: list):
+        """
+        Replace index content with given (id, latitude, longitude, row) tuples
+        """
+        self._reset()
+        self.rows = {point[0]: point[3] for point in points}
+        ids = np.fromiter((point[0] for point in points), dtype=np.int64, count=len(points))
+        latitudes = np.fromiter((point[1] for point in points), dtype=np.float64, count=len(points))
+        longitudes = np.fromiter((point[2] for point in points), dtype=np.float64, count=len(points))
+        self._build(ids, latitudes, longitudes)
+        self.ready = True
+
+    def _build(self, ids, latitudes, longitudes):
+        cells = self._cell(latitudes, longitudes)
+        order = np.argsort(cells, kind="stable")
+        self.cells, self.ids = cells[order], ids[order]
+        self.latitudes, self.longitudes = latitudes[order], longitudes[order]
+        self.dead = np.zeros(len(self.ids), dtype=bool)
+        self.slots = {id: (False, position) for position, id in enumerate(self.ids.tolist())}
+
+    def _kill(self, id: int):
+        """
+        Mark the slot currently holding id as dead, so that it is skipped by queries and dropped on merge
+        """
+        slot = self.slots.pop(id, None)
+        if slot is None:
+            return
+        pending, position = slot
+        if pending:
+            self.pending_dead[position] = True
+        else:
+            self.dead[position] = True
+        self.dead_count += 1
+
+    def add(self, id: int, latitude: float, longitude: float, row):
+        """
+        Add a point, replacing the one already indexed under the same id
+        """
+        self.extend([(id, latitude, longitude, row)])
+
+    def extend(self, points: list):
+        """
+        Add or replace many (id, latitude, longitude, row) points, merging them into the arrays once
+        """
+        for id, latitude, longitude, row in points:
+            self._kill(id)
+            self.rows[id] = row
+            for values, value in zip(self.pending, (id, latitude, longitude)):
+                values.append(value)
+            self.pending_dead.append(False)
+            self.slots[id] = (True, len(self.pending_dead) - 1)
+        if len(self.pending[0]) + self.dead_count >= self.merge_threshold:
+            self.merge()
+
+    def remove(self, id: int):
+        if id in self.rows:
+            del self.rows[id]
+            self._kill(id)
+            if self.dead_count >= self.merge_threshold:
+                self.merge()
+
+    def merge(self):
+        """
+        Fold pending additions into the sorted arrays and drop dead points
+        """
+        keep = ~np.concatenate([self.dead, np.asarray(self.pending_dead, dtype=bool)])
+        ids = np.concatenate([self.ids, np.asarray(self.pending[0], dtype=np.int64)])[keep]
+        latitudes = np.concatenate([self.latitudes, np.asarray(self.pending[1], dtype=np.float64)])[keep]
+        longitudes = np.concatenate([self.longitudes, np.asarray(self.pending[2], dtype=np.float64)])[keep]
+        self._build(ids, latitudes, longitudes)
+        self.pending = ([], [], [])
+        self.pending_dead = []
+        self.dead_count = 0
+
+    def _candidates(self, latitude: float, longitude: float, radius: float):
+        box = Geo.bounding_box(latitude=latitude, longitude=longitude, radius=radius)
+        first_row, first_column = divmod(int(self._cell(box["min_latitude"], box["min_longitude"])), self.columns)
+        last_row, last_column = divmod(int(self._cell(box["max_latitude"], box["max_longitude"])), self.columns)
+        count = (last_row - first_row + 1) * (last_column - first_column + 1)
+        if count * 8 > len(self.ids):
+            return np.arange(len(self.ids))
+        cells = (np.arange(first_row, last_row + 1)[:, None] * self.columns +
+                 np.arange(first_column, last_column + 1)[None, :]).ravel()
+        starts = np.searchsorted(self.cells, cells, side="left")
+        ends = np.searchsorted(self.cells, cells, side="right")
+        sizes = ends - starts
+        nonempty = sizes > 0
+        starts, sizes = starts[nonempty], sizes[nonempty]
+        if not len(sizes):
+            return np.empty(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(sizes) + sizes, sizes)
+        return offsets + np.arange(sizes.sum())
+
+    def query(self, latitude: float, longitude: float, radius: float, order_by_distance: bool = False):
+        """
+        Return ids and distances in meters of points within radius, ordered by distance or by id
+        Uses vectorized Haversine formula over the grid cells overlapping the bounding box
+        """
+        positions = self._candidates(latitude=latitude, longitude=longitude, radius=radius)
+        ids = np.concatenate([self.ids[positions], np.asarray(self.pending[0], dtype=np.int64)])
+        latitudes = np.concatenate([self.latitudes[positions], np.asarray(self.pending[1], dtype=np.float64)])
+        longitudes = np.concatenate([self.longitudes[positions], np.asarray(self.pending[2], dtype=np.float64)])
+
+        latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+        origin_latitude, origin_longitude = math.radians(latitude), math.radians(longitude)
+        a = (np.sin((latitudes - origin_latitude) / 2) ** 2 +
+             math.cos(origin_latitude) * np.cos(latitudes) * np.sin((longitudes - origin_longitude) / 2) ** 2)
+        distances = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+        matched = distances <= radius
+        if self.dead_count:
+            matched &= ~np.concatenate([self.dead[positions], np.asarray(self.pending_dead, dtype=bool)])
+        ids, distances = ids[matched], distances[matched]
+        order = np.lexsort((ids, distances)) if order_by_distance else np.argsort(ids)
+        return ids[order], distances[order]
@@ -7,6 +7,4 @@ class Hasher:
 
     @staticmethod
     def get_hash(data: str):
-        sha256_hash = hashlib.sha256()
-        sha256_hash.update(data.encode('utf-8'))
-        return sha256_hash.hexdigest()
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
@@ -0,0 +1,195 @@
+import csv
+import json
+import time
+import uuid
+from itertools import islice
+from typing import Iterator, Union
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from src.pkg.database.models import Activity, ActivityClosure, Building, Organization, PhoneNumber
+from src.pkg.logger.main import Logger
+
+NAMESPACE = uuid.UUID("8f0c6a52-3c1e-4bde-9a39-5f7d5d3b2a10")
+
+
+class Importer:
+    def __init__(self, async_session, logger: Logger, chunk_size: int = 5000):
+        self.async_session = async_session
+        self.logger = logger
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def read(path: str) -> Iterator[dict]:
+        """
+        Stream records from a CSV file with a header row or from an NDJSON file
+        """
+        with open(path, "r", encoding="utf-8", newline="") as stream:
+            if path.endswith(".csv"):
+                yield from csv.DictReader(stream)
+                return
+            for line in stream:
+                if line.strip():
+                    yield json.loads(line)
+
+    def chunks(self, records: Iterator[dict]) -> Iterator[list]:
+        records = iter(records)
+        while chunk := list(islice(records, self.chunk_size)):
+            yield chunk
+
+    @staticmethod
+    def key(kind: str, *values) -> uuid.UUID:
+        """
+        Deterministic uuid for records without one, so that re-running an import updates instead of duplicating
+        """
+        return uuid.uuid5(NAMESPACE, ":".join([kind, *map(str, values)]))
+
+    def progress(self, kind: str, total: int, skipped: int, started_at: float):
+        elapsed = time.monotonic() - started_at
+        self.logger.info("%s: %d rows imported, %d skipped, %.0f rows/s", kind, total, skipped,
+                         total / max(elapsed, 1e-9))
+
+    async def upsert(self, session, model, rows: list) -> dict:
+        """
+        Insert rows, updating the existing ones on uuid conflict, and return uuid -> id for all of them
+        """
+        table = model.__table__
+        rows = list({row["uuid"]: row for row in rows}.values())
+        query = insert(table)
+        query = query.on_conflict_do_update(
+            index_elements=[table.c.uuid],
+            set_={column: query.excluded[column] for column in rows[0] if column != "uuid"},
+        ).returning(table.c.uuid, table.c.id)
+        res = await session.execute(query, rows)
+        return dict(res.fetchall())
+
+    async def buildings(self, path: str):
+        started_at, total, skipped = time.monotonic(), 0, 0
+        for chunk in self.chunks(self.read(path)):
+            rows = []
+            for record in chunk:
+                try:
+                    latitude, longitude = float(record["latitude"]), float(record["longitude"])
+                    rows.append({
+                        "uuid": self.parse_uuid(record.get("uuid")) or
+                        self.key("building", record["address"], latitude, longitude),
+                        "address": record["address"],
+                        "latitude": latitude,
+                        "longitude": longitude,
+                    })
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+            if rows:
+                async with self.async_session() as session:
+                    await self.upsert(session, Building, rows)
+                    await session.commit()
+            total += len(rows)
+            self.progress("buildings", total=total, skipped=skipped, started_at=started_at)
+
+    async def activities(self, path: str):
+        """
+        Import activities parents first; parent is referenced by parent_uuid or by parent name
+        """
+        started_at, total, skipped = time.monotonic(), 0, 0
+        async with self.async_session() as session:
+            res = await session.execute(select(Activity.uuid, Activity.id, Activity.name))
+            rows = res.fetchall()
+        ids = {row.uuid: row.id for row in rows}
+        by_name = {row.name: row.uuid for row in rows}
+
+        pending = list(self.read(path))
+        while pending:
+            ready, waiting = [], []
+            for record in pending:
+                if not record.get("name"):
+                    skipped += 1
+                    continue
+                parent = None
+                if record.get("parent_uuid"):
+                    parent = self.parse_uuid(record["parent_uuid"])
+                elif record.get("parent"):
+                    parent = by_name.get(record["parent"])
+                if (record.get("parent_uuid") or record.get("parent")) and parent not in ids:
+                    waiting.append(record)
+                    continue
+                ready.append({
+                    "uuid": self.parse_uuid(record.get("uuid")) or self.key("activity", parent, record["name"]),
+                    "name": record["name"],
+                    "parent_id": ids[parent] if parent else None,
+                })
+            if not ready:
+                skipped += len(waiting)
+                self.progress("activities", total=total, skipped=skipped, started_at=started_at)
+                break
+            for chunk in self.chunks(ready):
+                async with self.async_session() as session:
+                    ids.update(await self.upsert(session, Activity, chunk))
+                    await session.commit()
+            by_name.update({row["name"]: row["uuid"] for row in ready})
+            total += len(ready)
+            pending = waiting
+            self.progress("activities", total=total, skipped=skipped, started_at=started_at)
+
+        await ActivityClosure.rebuild()
+
+    async def organizations(self, path: str):
+        """
+        Import organizations referencing building by building_uuid and activity by activity_uuid or activity name
+        Phone numbers of imported organizations are replaced by the ones in the record
+        """
+        started_at, total, skipped = time.monotonic(), 0, 0
+        for chunk in self.chunks(self.read(path)):
+            async with self.async_session() as session:
+                building_uuids = {self.parse_uuid(record.get("building_uuid")) for record in chunk} - {None}
+                res = await session.execute(
+                    select(Building.uuid, Building.id).where(Building.uuid.in_(building_uuids)))
+                buildings = dict(res.fetchall())
+                activity_uuids = {self.parse_uuid(record.get("activity_uuid")) for record in chunk} - {None}
+                activity_names = {record["activity"] for record in chunk if record.get("activity")}
+                res = await session.execute(
+                    select(Activity.uuid, Activity.name, Activity.id).where(
+                        Activity.uuid.in_(activity_uuids) | Activity.name.in_(activity_names)))
+                activities_by_uuid, activities_by_name = {}, {}
+                for row in res.fetchall():
+                    activities_by_uuid[row.uuid] = row.id
+                    activities_by_name.setdefault(row.name, row.id)
+
+                rows, phones = [], {}
+                for record in chunk:
+                    building_uuid = self.parse_uuid(record.get("building_uuid"))
+                    activity_id = activities_by_uuid.get(self.parse_uuid(record.get("activity_uuid")),
+                                                         activities_by_name.get(record.get("activity")))
+                    if not record.get("name") or building_uuid not in buildings or activity_id is None:
+                        skipped += 1
+                        continue
+                    key = self.parse_uuid(record.get("uuid")) or self.key("organization", record["name"],
+                                                                          building_uuid)
+                    rows.append({"uuid": key, "name": record["name"], "building_id": buildings[building_uuid],
+                                 "activity_id": activity_id})
+                    phones[key] = self.phone_numbers(record.get("phone_numbers"))
+                if rows:
+                    ids = await self.upsert(session, Organization, rows)
+                    await session.execute(delete(PhoneNumber).where(PhoneNumber.organization_id.in_(ids.values())))
+                    numbers = [{"number": number, "organization_id": ids[key]}
+                               for key, values in phones.items() for number in values]
+                    if numbers:
+                        await session.execute(insert(PhoneNumber.__table__), numbers)
+                    await session.commit()
+            total += len(rows)
+            self.progress("organizations", total=total, skipped=skipped, started_at=started_at)
+
+    @staticmethod
+    def parse_uuid(value) -> Union[uuid.UUID, None]:
+        if not value:
+            return
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            return
+
+    @staticmethod
+    def phone_numbers(value) -> list:
+        if not value:
+            return []
+        if isinstance(value, list):
+            return [str(number) for number in value]
+        return [number.strip() for number in str(value).split(";") if number.strip()]
@@ -1,38 +1,158 @@
-import logging
 import sys
+import time
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+import orjson
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        item = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_info:
+            item["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(item, default=str).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Enqueue the record as is, message formatting is left to the writer thread
+        """
+        return record
+
+
+class BatchWriter(threading.Thread):
+    def __init__(self, records: queue.Queue, streams: list, formatter: logging.Formatter, batch_size: int = 100,
+                 flush_interval: float = 0.5):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.streams = streams
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stopped = object()
+
+    def run(self):
+        """
+        Wait for a record, collect more until the batch is full or flush_interval has passed since the first one,
+        then write them all with one flush
+        """
+        running = True
+        while running:
+            record = self.records.get()
+            if record is self.stopped:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.records.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if record is self.stopped:
+                    running = False
+                    break
+                batch.append(record)
+            self.write(batch)
+
+    def write(self, batch: list):
+        lines = []
+        for record in batch:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(f"{record.levelname} - unformattable log record: {record.msg!r}")
+        text = "\n".join(lines) + "\n"
+        for stream in self.streams:
+            stream.write(text)
+            stream.flush()
+
+    def stop(self):
+        self.records.put(self.stopped)
+        self.join()
 
 
 class Logger:
     def __init__(self, name, filename, cfg, console_output=False):
+        log_cfg = cfg.get("logging", {}) if cfg else {}
         logger = logging.getLogger(name)
-        logger.setLevel(logging.DEBUG)
-        file_handler = logging.FileHandler(filename)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-
-        logger.addHandler(file_handler)
+        logger.setLevel(log_cfg.get("level", "DEBUG"))
+        if log_cfg.get("json", False):
+            formatter = JSONFormatter()
+        else:
+            formatter = TextFormatter('%(asctime)s - %(levelname)s - %(name)s | %(message)s')
 
-        if console_output:
-            stream_handler = logging.StreamHandler(sys.stdout)
-            logger.addHandler(stream_handler)
+        self.writer = None
+        if log_cfg.get("async", True):
+            streams = [open(filename, "a", encoding="utf-8")]
+            if console_output:
+                streams.append(sys.stdout)
+            records = queue.SimpleQueue()
+            self.writer = BatchWriter(records=records, streams=streams, formatter=formatter,
+                                      batch_size=log_cfg.get("batch_size", 100),
+                                      flush_interval=log_cfg.get("flush_interval", 0.5))
+            self.writer.start()
+            atexit.register(self.close)
+            logger.addHandler(DeferredQueueHandler(records))
+            logger.propagate = False
+        else:
+            file_handler = logging.FileHandler(filename)
+            file_handler.setFormatter(formatter)
+            logger.addHandler(file_handler)
+            if console_output:
+                stream_handler = logging.StreamHandler(sys.stdout)
+                stream_handler.setFormatter(formatter)
+                logger.addHandler(stream_handler)
 
         self.name = name
         self.logger = logger
         self.cfg = cfg
+        self.sample_rate = log_cfg.get("info_sample_rate", 1.0)
+
+    def _log(self, level: int, msg: str, args: tuple, fields: dict):
+        """
+        Messages are formatted lazily as msg % args, and only if the level is enabled
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        if level == logging.INFO and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(level, msg, *args, extra={"fields": fields} if fields else None)
 
-    def success(self, msg):
-        msg = f"{self.name} | SUCCESS: {msg}"
-        self.logger.info(msg)
+    def success(self, msg, *args, **fields):
+        self._log(logging.INFO, "SUCCESS: " + msg, args, fields)
 
-    def info(self, msg):
-        msg = f"{self.name} | {msg}"
-        self.logger.info(msg)
+    def info(self, msg, *args, **fields):
+        self._log(logging.INFO, msg, args, fields)
 
-    def error(self, msg):
-        msg = f"{self.name} | {msg}"
-        self.logger.error(msg)
+    def error(self, msg, *args, **fields):
+        self._log(logging.ERROR, msg, args, fields)
 
-    def warning(self, msg):
-        msg = f"{self.name} | {msg}"
-        self.logger.warning(msg)
+    def warning(self, msg, *args, **fields):
+        self._log(logging.WARNING, msg, args, fields)
 
+    def close(self):
+        """
+        Write out queued records and stop the writer thread
+        """
+        if self.writer is not None and self.writer.is_alive():
+            self.writer.stop()
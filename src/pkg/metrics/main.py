@@ -0,0 +1,128 @@
+import time
+import bisect
+import contextlib
+import contextvars
+
+current_stages = contextvars.ContextVar("current_stages", default=None)
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def stage(self, stage: str, seconds: float):
+        """
+        Record time spent in a stage of the request currently being handled, kept until its route is known
+        Stages outside of requests, like pool warm up, are recorded under route "none"
+        """
+        if not self.enabled:
+            return
+        stages = current_stages.get()
+        if stages is None:
+            self.observe("app_stage_duration_seconds", seconds, route="none", stage=stage)
+            return
+        stages.append((stage, seconds))
+
+    @contextlib.contextmanager
+    def timed(self, stage: str):
+        if not self.enabled:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage(stage, time.perf_counter() - started_at)
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def _labels(self, labels) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{self._escape(value)}"' for key, value in labels) + "}"
+
+    def render(self, families: tuple = ()) -> str:
+        """
+        All histograms and given (name, type, help, [(labels, value), ...]) families
+        in Prometheus text exposition format
+        """
+        lines = []
+        by_name = {}
+        for (name, labels), histogram in self.histograms.items():
+            by_name.setdefault(name, []).append((labels, histogram))
+        for name, items in sorted(by_name.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in items:
+                cumulative = 0
+                for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._labels((*labels, ('le', bound)))} {cumulative}")
+                lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{self._labels(tuple(labels.items()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        """
+        Time every HTTP request by route template, method and status and label the stages recorded while handling it
+        """
+        if scope["type"] != "http" or not self.metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stages = []
+        token = current_stages.set(stages)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.metrics.observe("app_request_duration_seconds", time.perf_counter() - started_at,
+                                 route=route, method=scope["method"], status=status[0])
+            for stage, seconds in stages:
+                self.metrics.observe("app_stage_duration_seconds", seconds, route=route, stage=stage)
+            current_stages.reset(token)
+
+
+metrics = Metrics()
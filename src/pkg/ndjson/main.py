@@ -0,0 +1,23 @@
+from typing import AsyncIterator
+from src.pkg.serialization.main import JSON
+
+
+class NDJSON:
+    media_type = "application/x-ndjson"
+
+    def __init__(self):
+        return
+
+    @staticmethod
+    async def encode(rows: AsyncIterator, chunk_size: int = 100) -> AsyncIterator[bytes]:
+        """
+        Encode rows as newline-delimited JSON, yielding a chunk per chunk_size rows
+        """
+        lines = []
+        async for row in rows:
+            lines.append(JSON.dumps(row))
+            if len(lines) >= chunk_size:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
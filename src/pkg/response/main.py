@@ -0,0 +1,10 @@
+from typing import Any
+from fastapi import Response
+from src.pkg.serialization.main import JSON
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return JSON.dumps(content)
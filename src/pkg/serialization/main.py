@@ -0,0 +1,21 @@
+import orjson
+from typing import Any
+
+
+class JSON:
+    def __init__(self):
+        return
+
+    @staticmethod
+    def dumps(content: Any) -> bytes:
+        """
+        Serialize content with orjson, handling UUIDs natively and embedding orjson.Fragment values as is
+        """
+        return orjson.dumps(content, default=str)
+
+    @staticmethod
+    def fragment(row: dict) -> orjson.Fragment:
+        """
+        Pre-encode a row once so it can be embedded into responses without serializing it again
+        """
+        return orjson.Fragment(JSON.dumps(row))
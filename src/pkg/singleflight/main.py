@@ -0,0 +1,37 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]) -> Any:
+        """
+        Run func once for all concurrent callers with the same key and return its result to each of them
+        The call runs in its own task, so a cancelled caller does not cancel it for the others
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(func())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None) if self.calls.get(key) is task else None)
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+
+def coalesced(method):
+    """
+    Share one in-flight call of a repository method between identical concurrent calls through its self.flight
+    """
+    name = method.__qualname__
+
+    @functools.wraps(method)
+    async def wrapper(self, **kwargs):
+        if self.flight is None:
+            return await method(self, **kwargs)
+        return await self.flight.do(key=(name, repr(sorted(kwargs.items()))), func=lambda: method(self, **kwargs))
+    return wrapper
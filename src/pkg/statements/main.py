@@ -0,0 +1,69 @@
+import time
+from sqlalchemy import text
+from src.pkg.metrics.main import metrics
+
+
+class Statement:
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.query = text(sql)
+        self.calls = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def observe(self, seconds: float):
+        metrics.stage("query", seconds)
+        self.calls += 1
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+
+    async def execute(self, session, params: dict = None):
+        started_at = time.perf_counter()
+        try:
+            return await session.execute(self.query, params)
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+    async def stream(self, session, params: dict = None):
+        """
+        Open a server-side cursor for the statement; only the time to the first batch is observed
+        """
+        started_at = time.perf_counter()
+        try:
+            return await session.stream(self.query, params)
+        finally:
+            self.observe(time.perf_counter() - started_at)
+
+
+class Statements:
+    def __init__(self):
+        self.statements = {}
+
+    def get(self, name: str, sql: str) -> Statement:
+        """
+        Registered statement for given name and SQL, compiled once and reused by every call
+        Identical SQL text lets asyncpg reuse its server-side prepared statement on each pooled connection
+        """
+        statement = self.statements.get((name, sql))
+        if statement is None:
+            statement = self.statements[(name, sql)] = Statement(name=name, sql=sql)
+        return statement
+
+    def stats(self) -> dict:
+        """
+        Timings per statement name, summed over its SQL variants
+        """
+        stats = {}
+        for statement in self.statements.values():
+            item = stats.setdefault(statement.name, {"variants": 0, "calls": 0, "seconds_total": 0.0,
+                                                     "seconds_max": 0.0})
+            item["variants"] += 1
+            item["calls"] += statement.calls
+            item["seconds_total"] += statement.seconds_total
+            item["seconds_max"] = max(item["seconds_max"], statement.seconds_max)
+        for item in stats.values():
+            item["seconds_avg"] = item["seconds_total"] / item["calls"] if item["calls"] else 0.0
+        return dict(sorted(stats.items()))
+
+
+statements = Statements()
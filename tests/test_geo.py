@@ -0,0 +1,53 @@
+import unittest
+from src.pkg.geo.main import SpatialIndex
+
+
+class SpatialIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SpatialIndex(cell_size=0.05)
+        self.index.load([(1, 55.75, 37.62, "a"), (2, 55.76, 37.63, "b")])
+
+    def query(self, latitude: float, longitude: float, radius: float = 500) -> list:
+        ids, _ = self.index.query(latitude=latitude, longitude=longitude, radius=radius)
+        return ids.tolist()
+
+    def test_resave_moves_point(self):
+        self.index.add(1, 59.93, 30.33, "a moved")
+        self.assertEqual(self.query(55.75, 37.62), [])
+        self.assertEqual(self.query(59.93, 30.33), [1])
+        self.assertEqual(self.index.rows[1], "a moved")
+
+    def test_resave_of_pending_point(self):
+        self.index.add(3, 55.75, 37.62, "c")
+        self.index.add(3, 59.93, 30.33, "c moved")
+        self.assertEqual(self.query(55.75, 37.62), [1])
+        self.assertEqual(self.query(59.93, 30.33), [3])
+
+    def test_remove_then_add(self):
+        self.index.remove(1)
+        self.assertEqual(self.query(55.75, 37.62), [])
+        self.index.add(1, 59.93, 30.33, "a")
+        self.assertEqual(self.query(55.75, 37.62), [])
+        self.assertEqual(self.query(59.93, 30.33), [1])
+
+    def test_merge_keeps_only_live_points(self):
+        self.index.add(1, 59.93, 30.33, "a")
+        self.index.remove(2)
+        self.index.add(2, 55.75, 37.62, "b")
+        self.index.merge()
+        self.assertEqual(sorted(self.index.ids.tolist()), [1, 2])
+        self.assertEqual(self.query(55.75, 37.62), [2])
+        self.assertEqual(self.query(59.93, 30.33), [1])
+
+    def test_merge_threshold(self):
+        index = SpatialIndex(cell_size=0.05, merge_threshold=4)
+        index.load([])
+        for _ in range(10):
+            index.add(1, 55.75, 37.62, "a")
+        self.assertLessEqual(len(index.ids) + len(index.pending[0]), 4)
+        ids, _ = index.query(latitude=55.75, longitude=37.62, radius=500)
+        self.assertEqual(ids.tolist(), [1])
+
+
+if __name__ == '__main__':
+    unittest.main()